@@ -0,0 +1,56 @@
+import json
+import struct
+
+from enum import IntEnum
+from typing import Any, Tuple
+
+# Every frame starts with its type and a correlation ID, followed by its payload
+HEADER = struct.Struct("!BI")
+# Payload of CREDIT frames, i.e., the number of frames the peer may send in addition
+CREDITS = struct.Struct("!I")
+# Payload of ACK and RESULT frames starts with an HTTP status, followed by the reason
+STATUS = struct.Struct("!H")
+
+
+class FrameType(IntEnum):
+    HELLO = 1  # Service -> SIF-edge, the endpoints the channel serves and their initial credits
+    EVENT = 2  # Service -> SIF-edge, an EventRequest
+    ACK = 3  # SIF-edge -> service, the status of an EVENT
+    INVOKE = 4  # SIF-edge -> service, an invocation of a function
+    RESULT = 5  # Service -> SIF-edge, the status of an INVOKE
+    CREDIT = 6  # Either way, grants the peer more frames
+
+
+def encode(kind: FrameType, frame_id: int = 0, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, frame_id) + payload
+
+
+def decode(frame: bytes) -> Tuple[FrameType, int, bytes]:
+    """
+    :returns: the type, correlation ID and payload of a frame
+    :raises ValueError: if the frame is malformed
+    """
+    if len(frame) < HEADER.size:
+        raise ValueError(f"Frame of {len(frame)} bytes is too short")
+    kind, frame_id = HEADER.unpack_from(frame)
+    return FrameType(kind), frame_id, frame[HEADER.size:]
+
+
+def encode_json(kind: FrameType, frame_id: int, payload: Any) -> bytes:
+    return encode(kind, frame_id, json.dumps(payload, separators=(",", ":")).encode())
+
+
+def encode_credits(credits: int) -> bytes:
+    return encode(FrameType.CREDIT, 0, CREDITS.pack(credits))
+
+
+def encode_status(kind: FrameType, frame_id: int, status: int, reason: str = None) -> bytes:
+    return encode(kind, frame_id, STATUS.pack(status) + (reason or "").encode())
+
+
+def decode_status(payload: bytes) -> Tuple[int, str]:
+    """
+    :returns: the status and reason of an ACK or RESULT payload
+    """
+    status, = STATUS.unpack_from(payload)
+    return status, payload[STATUS.size:].decode()
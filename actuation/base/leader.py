@@ -0,0 +1,209 @@
+import os
+import time
+import fcntl
+import socket
+import logging
+import urllib3
+
+from abc import ABC, abstractmethod
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseBackend(ABC):
+    """
+    Storage of the lease held by the leader among the processes running the
+    same service
+    """
+
+    @abstractmethod
+    def acquire(self, holder: str, ttl: float) -> bool:
+        """
+        Takes the lease for `ttl` seconds, or renews it if `holder` already
+        holds it
+
+        :returns: whether `holder` holds the lease
+        """
+        raise NotImplementedError("Implement the 'acquire' method in your class")
+
+    @abstractmethod
+    def release(self, holder: str):
+        """
+        Gives the lease up, so another process takes it right away
+        """
+        raise NotImplementedError("Implement the 'release' method in your class")
+
+
+class FileLease(LeaseBackend):
+    """
+    Lease held through an exclusive `flock` on a file, for the uvicorn
+    workers of a host or replicas sharing a volume. The operating system
+    releases it as soon as the leader dies, so the `ttl` is not needed.
+
+    :param path: File to lock, created if missing
+    """
+
+    def __init__(self, path: str):
+        super(FileLease, self).__init__()
+        self.path = path
+        self.fd = None
+
+    def acquire(self, holder: str, ttl: float) -> bool:
+        if self.fd is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = open(self.path, "a+")
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fd.close()
+            return False
+        fd.truncate(0)
+        fd.write(holder)
+        fd.flush()
+        self.fd = fd
+        return True
+
+    def release(self, holder: str):
+        if self.fd is None:
+            return
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.fd.close()
+        self.fd = None
+
+
+class SchedulerLease(LeaseBackend):
+    """
+    Lease stored under a key at SIF-edge's `/api/lease`, for replicas on
+    different hosts. The leader renews it before it expires, and keeps
+    leading while the scheduler is unreachable until its lease would have
+    expired.
+
+    :param scheduler: URL of the SIF-edge scheduler
+    :param key: Name of the lease, e.g., the service's name
+    """
+
+    def __init__(self, scheduler: str, key: str):
+        super(SchedulerLease, self).__init__()
+        self.scheduler = scheduler if scheduler.startswith("http") else f"http://{scheduler}"
+        self.key = key
+        self.http = urllib3.PoolManager(maxsize=1)
+        self.expires = 0.0
+
+    def acquire(self, holder: str, ttl: float) -> bool:
+        started = time.monotonic()
+        try:
+            res = self.http.request("POST", f"{self.scheduler}/api/lease", json=dict(key=self.key, holder=holder, ttl=ttl),
+                                    retries=False, timeout=urllib3.Timeout(total=ttl / 3))
+        except Exception as err:
+            logger.warning(f"Failure renewing the lease {self.key} because {err}")
+            return started < self.expires
+        if res.status == 200:
+            self.expires = started + ttl
+            return True
+        if res.status != 409:
+            logger.warning(f"Failure renewing the lease {self.key} because {res.reason}")
+            return started < self.expires
+        self.expires = 0.0
+        return False
+
+    def release(self, holder: str):
+        self.expires = 0.0
+        try:
+            self.http.request("DELETE", f"{self.scheduler}/api/lease", json=dict(key=self.key, holder=holder),
+                              retries=False, timeout=urllib3.Timeout(total=5))
+        except Exception as err:
+            logger.warning(f"Failure releasing the lease {self.key} because {err}")
+
+
+class LeaderElector(ABC):
+    """
+    Elects a single leader among the processes running the same service,
+    e.g., uvicorn workers or Kubernetes replicas, by having all of them try
+    to take the same lease every `ttl / 3` seconds.
+
+    The :class:`LocalGateway <gateway.LocalGateway>` only runs its periodic
+    triggers on the leader. If the leader dies, another process takes the
+    lease once it is released or expires and starts them instead.
+
+    :param backend: :class:`LeaseBackend <LeaseBackend>` holding the lease
+    :param ttl: Seconds the lease lasts without renewal, defaults to `LEADER_TTL` or 15
+    :param on_elected: Called from the elector's thread once this process leads
+    :param on_demoted: Called from the elector's thread once this process stops leading
+    """
+
+    def __init__(self, backend: LeaseBackend, ttl: float = None, on_elected: Callable[[], None] = None,
+                 on_demoted: Callable[[], None] = None):
+        super(LeaderElector, self).__init__()
+        self.backend = backend
+        self.ttl: float = ttl or float(os.environ.get("LEADER_TTL", "15"))
+        self.holder = f"{socket.gethostname()}-{os.getpid()}"
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.leader = False
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thr: Optional[Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader
+
+    def start(self):
+        self.stopped.clear()
+        self.thr = Thread(target=self.run, daemon=True)
+        self.thr.start()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                leads = self.backend.acquire(self.holder, self.ttl)
+            except Exception as err:
+                logger.error(f"Failure acquiring the lease: {err}")
+                leads = False
+            with self.lock:
+                if not self.stopped.is_set():
+                    self.__transition(leads)
+            self.stopped.wait(self.ttl / 3)
+
+    def __transition(self, leads: bool):
+        if leads == self.leader:
+            return
+        self.leader = leads
+        logger.info(f"{self.holder} {'became' if leads else 'is no longer'} the leader")
+        cb = self.on_elected if leads else self.on_demoted
+        if cb is not None:
+            cb()
+
+    def stop(self):
+        """
+        Stops competing for the lease and releases it if held
+        """
+        with self.lock:
+            self.stopped.set()
+            if self.leader:
+                self.backend.release(self.holder)
+                self.__transition(False)
+
+
+def lease_from_env() -> Optional[LeaseBackend]:
+    """
+    Returns the lease backend selected by `LEADER_ELECTION`, i.e., `file`,
+    locking `LEADER_LOCK_PATH`, or `scheduler`, storing `LEADER_KEY` at
+    SIF-edge. `None` if it is not set, so every process leads
+    """
+    kind = os.environ.get("LEADER_ELECTION", "").lower()
+    if kind == "file":
+        return FileLease(os.environ.get("LEADER_LOCK_PATH", "/tmp/sif-leader.lock"))
+    if kind == "scheduler":
+        key = os.environ.get("LEADER_KEY", None)
+        if key is None:
+            raise ValueError("LEADER_KEY must name the lease shared by the replicas of the service")
+        return SchedulerLease(os.environ.get("SCH_SERVICE_NAME", "localhost:8080"), key)
+    if kind:
+        raise ValueError(f"Unknown LEADER_ELECTION backend {kind}, use file or scheduler")
+    return None
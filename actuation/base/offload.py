@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import functools
+import contextvars
+
+from abc import ABC
+from enum import Enum
+from threading import Lock
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from .deadline import get_deadline, set_deadline
+
+class Offload(str, Enum):
+    """
+    Where the :class:`LocalGateway <gateway.LocalGateway>` runs a handler
+    """
+    LOOP = "loop"  # On the event loop, only for handlers which never block
+    THREAD = "thread"  # On a worker thread, for blocking I/O, e.g., Influx or MinIO
+    PROCESS = "process"  # On a worker process, for CPU-bound work, e.g., training models
+
+
+class RequestSnapshot(ABC):
+    """
+    Picklable copy of a :class:`Request <fastapi.Request>` handed to handlers
+    running on a worker process. It offers the parts of the request the
+    handlers rely on, i.e., `body`, `json`, `headers`, `query_params` and
+    `path_params`.
+    """
+
+    def __init__(self, method: str, url: str, headers: Dict[str, str], query_params: Dict[str, str],
+                 path_params: Dict[str, Any], body: bytes):
+        super(RequestSnapshot, self).__init__()
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.query_params = query_params
+        self.path_params = path_params
+        self._body = body
+
+    @classmethod
+    async def of(cls, request: Request) -> "RequestSnapshot":
+        return cls(request.method, str(request.url), dict(request.headers), dict(request.query_params),
+                   dict(request.path_params), await request.body())
+
+    async def body(self) -> bytes:
+        return self._body
+
+    async def json(self) -> Any:
+        return json.loads(self._body)
+
+
+def run_handler(cb: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any],
+                deadline: Optional[float] = None) -> Tuple[float, Any]:
+    """
+    Runs a handler to completion on a worker, with an event loop of its own
+    if it is a coroutine function
+
+    :returns: the time the worker picked the handler up and its result
+    """
+    started = time.time()
+    if deadline is not None:
+        # Worker processes do not inherit the context of the request
+        set_deadline(deadline)
+    res = cb(*args, **kwargs)
+    if inspect.isawaitable(res):
+        res = asyncio.run(res)
+    return started, res
+
+
+class HandlerPools(ABC):
+    """
+    Worker pools running the handlers deployed on the
+    :class:`LocalGateway <gateway.LocalGateway>`, so blocking handlers do not
+    stall the event loop, which keeps answering health checks and other
+    invocations meanwhile.
+
+    Handlers run on a thread pool by default, or on a process pool if they
+    are CPU-bound. Handlers offloaded to processes must be module-level
+    functions returning picklable results, and they receive a
+    :class:`RequestSnapshot <RequestSnapshot>` instead of the request. The
+    deadline of the invocation is propagated to both kinds of workers.
+
+    :param threads: Number of worker threads, defaults to `HANDLER_THREADS` or 4
+    :param processes: Number of worker processes, defaults to `HANDLER_PROCESSES` or the number of CPUs
+    """
+
+    def __init__(self, threads: int = None, processes: int = None):
+        super(HandlerPools, self).__init__()
+        self.sizes = {
+            Offload.THREAD: threads or int(os.environ.get("HANDLER_THREADS", "4")),
+            Offload.PROCESS: processes or int(os.environ.get("HANDLER_PROCESSES", str(os.cpu_count() or 1))),
+        }
+        self.pools: Dict[Offload, Executor] = {}
+        self.lock = Lock()
+        self.stats = {kind: {"submitted": 0, "inflight": 0, "completed": 0, "failed": 0,
+                             "wait_seconds": 0.0, "max_wait_seconds": 0.0} for kind in self.sizes}
+
+    def pool(self, kind: Offload) -> Executor:
+        with self.lock:
+            if kind not in self.pools:
+                if kind == Offload.PROCESS:
+                    self.pools[kind] = ProcessPoolExecutor(max_workers=self.sizes[kind])
+                else:
+                    self.pools[kind] = ThreadPoolExecutor(
+                        max_workers=self.sizes[kind], thread_name_prefix="handler")
+            return self.pools[kind]
+
+    def wrap(self, cb: Callable[..., Any], kind: Offload) -> Callable[..., Any]:
+        """
+        Returns an endpoint with the same signature as `cb`, which runs `cb`
+        on the given kind of worker
+        """
+        if kind == Offload.LOOP:
+            return cb
+
+        @functools.wraps(cb)
+        async def endpoint(*args, **kwargs):
+            if kind == Offload.PROCESS:
+                args = [await RequestSnapshot.of(v) if isinstance(v, Request) else v for v in args]
+                kwargs = {k: await RequestSnapshot.of(v) if isinstance(v, Request) else v
+                          for k, v in kwargs.items()}
+                call = functools.partial(run_handler, cb, tuple(args), kwargs, get_deadline())
+            else:
+                for v in [*args, *kwargs.values()]:
+                    if isinstance(v, Request):
+                        # Read the body on the event loop, the handler gets it from the cache
+                        await v.body()
+                # The context carries the deadline of the invocation into the thread
+                call = functools.partial(contextvars.copy_context().run, run_handler, cb, tuple(args), kwargs)
+            return await self.__submit(kind, call)
+
+        return endpoint
+
+    async def __submit(self, kind: Offload, call: Callable[[], Tuple[float, Any]]) -> Any:
+        stats = self.stats[kind]
+        submitted = time.time()
+        with self.lock:
+            stats["submitted"] += 1
+            stats["inflight"] += 1
+        ok = False
+        try:
+            started, res = await asyncio.get_running_loop().run_in_executor(self.pool(kind), call)
+            ok = True
+            wait = max(started - submitted, 0)
+            with self.lock:
+                stats["wait_seconds"] += wait
+                stats["max_wait_seconds"] = max(stats["max_wait_seconds"], wait)
+            return res
+        finally:
+            with self.lock:
+                stats["inflight"] -= 1
+                stats["completed" if ok else "failed"] += 1
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the queueing metrics of every pool, where `queued` counts the
+        handlers waiting for a free worker
+        """
+        metrics = {}
+        with self.lock:
+            for kind, stats in self.stats.items():
+                done = stats["completed"] + stats["failed"]
+                metrics[kind.value] = {
+                    **stats,
+                    "workers": self.sizes[kind],
+                    "running": min(stats["inflight"], self.sizes[kind]),
+                    "queued": max(stats["inflight"] - self.sizes[kind], 0),
+                    "avg_wait_seconds": stats["wait_seconds"] / done if done else 0.0,
+                }
+        return metrics
+
+    def shutdown(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self.pools.clear()
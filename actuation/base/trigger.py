@@ -1,19 +1,68 @@
 import time
-import schedule
+import asyncio
+import logging
 import durationpy
 
 from abc import ABC
-from datetime import timedelta
-from threading import Thread
+from enum import Enum
+from typing import Optional, Set, Tuple
 
 from base import BaseEventFabric
+from .timer import TimerHandle, get_timer_service
+from .checkpoint import get_checkpoint
+from .schedule import CronExpression, Schedule, TimeWindow
 
+logger = logging.getLogger(__name__)
 
-def one_shot_cb(cb):
-    def handler():
-        cb()
-        return schedule.CancelJob
-    return handler
+
+class CatchUp(str, Enum):
+    """
+    What a named trigger does about the executions it missed while the
+    process was down
+    """
+    SKIP = "skip"  # Resume at the next slot of the previous schedule
+    ONCE = "once"  # Run once after the wait time, then resume
+    ALL = "all"  # Run every missed execution after the wait time, then resume
+
+
+def build_schedule(duration: str, one_shot: bool, cron: str = None, jitter: str = None,
+                   window: str = None) -> Schedule:
+    return Schedule(
+        interval=None if one_shot or cron is not None else durationpy.from_str(duration).total_seconds(),
+        cron=CronExpression(cron) if cron is not None else None,
+        jitter=durationpy.from_str(jitter).total_seconds() if jitter is not None else 0,
+        window=TimeWindow(window) if window is not None else None)
+
+
+def resume_schedule(name: Optional[str], schedule: Schedule, first: float,
+                    catch_up: CatchUp) -> Tuple[float, int]:
+    """
+    Computes when a periodic trigger must fire first from the last time it
+    fired, as recorded in the :func:`checkpoint <checkpoint.get_checkpoint>`
+
+    :param name: Name of the trigger, unnamed triggers are not resumed
+    :param schedule: :class:`Schedule <schedule.Schedule>` of the trigger
+    :param first: Time the first execution is due if the trigger never fired
+    :param catch_up: Policy for the executions missed meanwhile
+    :returns: the time the first execution is due and how many times the callback must run then
+    """
+    checkpoint = get_checkpoint()
+    if name is None or not schedule.periodic or checkpoint is None:
+        return first, 1
+    last = checkpoint.get(name)
+    if last is None:
+        return first, 1
+
+    due, missed = schedule.missed(last, time.time())
+    if missed == 0 or catch_up == CatchUp.SKIP:
+        return due, 1
+    return first, missed if catch_up == CatchUp.ALL else 1
+
+
+def record_fire(name: Optional[str]):
+    checkpoint = get_checkpoint()
+    if name is not None and checkpoint is not None:
+        checkpoint.record(name, time.time())
 
 
 class Trigger(ABC):
@@ -22,46 +71,83 @@ class Trigger(ABC):
     Periodic Triggers for Event Request generation through the :class:`BaseEvent <event.BaseEvent>`
     factory.
 
-    Once any child of this class has been instantiated, it will launch a local
-    scheduler, which calls the given callback. The callback must take arguments.
+    Once any child of this class has been instantiated, it is scheduled on the
+    process-wide :class:`TimerService <timer.TimerService>`, which calls the
+    given callback. All triggers share the thread of that service. The
+    callback must take arguments.
+
+    Instead of every `duration`, a trigger may follow a `cron` expression
+    aligned to the wall-clock time. Each execution can be delayed by a random
+    `jitter` and constrained to a daily `window`, e.g., `02:00-05:00`, so
+    heavy jobs run off-peak without firing all at once.
+
+    If a `name` is given and the `TRIGGER_STATE_PATH` environment variable is
+    set, the time of every execution is persisted, so a periodic trigger
+    resumes its schedule after a restart rather than firing after the wait
+    time again. The executions missed meanwhile are handled as per `catch_up`.
 
     :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
     :param duration: frequency of event generation using Golang's time representation, e.g., 1h1m1s
     :param one_shot: indicates if the trigger must be run only once
     :param wait_time: indicates if there must be a delay before scheduling the first executions
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param cron: :class:`cron expression <schedule.CronExpression>` replacing the `duration`, e.g., `0 2 * * *`
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
     """
 
-    def __init__(self, evt_cb: BaseEventFabric, duration: str = "1s", one_shot: bool = False, wait_time: str = None):
+    def __init__(self, evt_cb: BaseEventFabric, duration: str = "1s", one_shot: bool = False, wait_time: str = None,
+                 name: str = None, catch_up: CatchUp | str = CatchUp.SKIP, cron: str = None, jitter: str = None,
+                 window: str = None):
         super(Trigger, self).__init__()
+        self.evt_cb = evt_cb
+        self.name = name
+        self.catch_up = CatchUp(catch_up)
+        self.cancelled = False
 
         self.wt = None
         if wait_time is not None:
             self.wt = durationpy.from_str(wait_time)
-        else:
+        elif cron is None:
             print("Running trigger inmediately...")
 
-        dt: timedelta = durationpy.from_str(duration)
-        self.scheduler = schedule.Scheduler()
-        fn = self.scheduler.every(dt.total_seconds()).seconds
-        if one_shot:
-            fn.do(one_shot_cb(evt_cb))
+        self.schedule = build_schedule(duration, one_shot, cron, jitter, window)
+        now = time.time()
+        if cron is not None:
+            first = self.schedule.cron.next_after(now)
         else:
-            fn.do(evt_cb)
+            # The first execution is delayed by the wait time, if any, otherwise
+            # it happens once the duration has elapsed
+            wt = self.wt if self.wt is not None else durationpy.from_str(duration)
+            first = now + wt.total_seconds()
+        self.due, self.runs = resume_schedule(name, self.schedule, first, self.catch_up)
+        self.timer: TimerHandle = self.__schedule()
 
-        self.thr = Thread(target=self.run)
-        self.thr.start()
+    def __schedule(self) -> TimerHandle:
+        return get_timer_service().schedule(
+            self.schedule.place(self.due) - time.time(), self.fire)
 
-    def run(self):
-        while True:
-            if self.wt is not None:
-                time.sleep(self.wt.total_seconds())
+    def fire(self):
+        runs, self.runs = self.runs, 1
+        record_fire(self.name)
+        try:
+            for _ in range(runs):
+                self.evt_cb()
+        finally:
+            if self.schedule.periodic and not self.cancelled:
+                self.due = self.schedule.next_after(self.due, time.time())
+                self.timer = self.__schedule()
+                # It may have been cancelled from another thread meanwhile
+                if self.cancelled:
+                    self.timer.cancel()
 
-            self.scheduler.run_pending()
-            pending_jobs = self.scheduler.get_jobs()
-            if len(pending_jobs) == 0:
-                return
-
-            time.sleep(1)
+    def cancel(self):
+        """
+        Stops any further execution of the trigger
+        """
+        self.cancelled = True
+        self.timer.cancel()
 
 
 class OneShotTrigger(Trigger):
@@ -84,8 +170,197 @@ class PeriodicTrigger(Trigger):
     :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
     :param duration: frequency of event generation using Golang's time representation, e.g., 1h1m1s
     :param wait_time: indicates if there must be a delay before scheduling the first executions
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
     """
 
-    def __init__(self, evt_cb: BaseEventFabric, duration: str, wait_time: str = None):
+    def __init__(self, evt_cb: BaseEventFabric, duration: str, wait_time: str = None,
+                 name: str = None, catch_up: CatchUp | str = CatchUp.SKIP, jitter: str = None, window: str = None):
         super(PeriodicTrigger, self).__init__(
-            evt_cb, duration, wait_time=wait_time)
\ No newline at end of file
+            evt_cb, duration, wait_time=wait_time, name=name, catch_up=catch_up, jitter=jitter, window=window)
+
+
+class CronTrigger(Trigger):
+    """
+    Creates a Trigger following a cron expression
+
+    :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
+    :param cron: :class:`cron expression <schedule.CronExpression>`, e.g., `0 2 * * *` for every day at 02:00
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
+    """
+
+    def __init__(self, evt_cb: BaseEventFabric, cron: str, name: str = None,
+                 catch_up: CatchUp | str = CatchUp.SKIP, jitter: str = None, window: str = None):
+        super(CronTrigger, self).__init__(
+            evt_cb, name=name, catch_up=catch_up, cron=cron, jitter=jitter, window=window)
+
+
+class AsyncTrigger(ABC):
+    """
+    Asyncio variant of the :class:`Trigger <Trigger>`, scheduled on the event
+    loop serving the :class:`LocalGateway <gateway.LocalGateway>` through
+    `loop.call_at` rather than on a thread.
+
+    Register it with :meth:`LocalGateway.add_trigger <gateway.LocalGateway.add_trigger>`,
+    so it starts with the application's lifespan and is cancelled upon
+    shutdown. As nothing runs at import time, importing the module twice,
+    e.g., from uvicorn's reloader, does not start duplicate triggers. If the
+    callback returns a coroutine, it is run as a task on the same loop, and
+    events are sent through :meth:`BaseEventFabric.acall
+    <event.BaseEventFabric.acall>` in a task.
+    Named triggers resume their schedule, and cron expressions, jitter and
+    windows apply like for the :class:`Trigger <Trigger>`.
+
+    :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
+    :param duration: frequency of event generation using Golang's time representation, e.g., 1h1m1s
+    :param one_shot: indicates if the trigger must be run only once
+    :param wait_time: indicates if there must be a delay before scheduling the first executions
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param cron: :class:`cron expression <schedule.CronExpression>` replacing the `duration`, e.g., `0 2 * * *`
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
+    """
+
+    def __init__(self, evt_cb: BaseEventFabric, duration: str = "1s", one_shot: bool = False, wait_time: str = None,
+                 name: str = None, catch_up: CatchUp | str = CatchUp.SKIP, cron: str = None, jitter: str = None,
+                 window: str = None):
+        super(AsyncTrigger, self).__init__()
+        self.evt_cb = evt_cb
+        self.name = name
+        self.catch_up = CatchUp(catch_up)
+        self.runs = 1
+        self.schedule = build_schedule(duration, one_shot, cron, jitter, window)
+        self.delay: float = durationpy.from_str(wait_time or duration).total_seconds()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.due: float = 0.0
+        self.fired = False
+        self.cancelled = False
+        self.tasks: Set[asyncio.Task] = set()
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the trigger will not fire anymore
+        """
+        return self.cancelled or (self.fired and not self.schedule.periodic and not self.tasks)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Schedules the first execution, it must be called from the loop's thread
+
+        :param loop: Event loop to run on, defaults to the running one
+        """
+        if self.loop is not None or self.cancelled:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        now = time.time()
+        first = self.schedule.cron.next_after(now) if self.schedule.cron is not None else now + self.delay
+        self.due, self.runs = resume_schedule(
+            self.name, self.schedule, first, self.catch_up)
+        self.__schedule()
+
+    def __schedule(self):
+        # The schedule is computed in wall-clock time, while the loop runs on its own clock
+        delay = self.schedule.place(self.due) - time.time()
+        self.handle = self.loop.call_at(self.loop.time() + max(delay, 0), self.fire)
+
+    def fire(self):
+        self.handle = None
+        self.fired = True
+        runs, self.runs = self.runs, 1
+        record_fire(self.name)
+        for _ in range(runs):
+            try:
+                # Events wait for their local subscribers on the loop without blocking it
+                res = self.evt_cb.acall() if isinstance(self.evt_cb, BaseEventFabric) else self.evt_cb()
+                if asyncio.iscoroutine(res):
+                    task = self.loop.create_task(res)
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+            except Exception as err:
+                logger.error(f"Failure in trigger callback {self.evt_cb}: {err}")
+
+        # The callback may have cancelled the trigger
+        if not self.schedule.periodic or self.cancelled:
+            return
+        self.due = self.schedule.next_after(self.due, time.time())
+        self.__schedule()
+
+    def pause(self):
+        """
+        Stops scheduling executions until :meth:`start` is called again, e.g.,
+        once this process is no longer the leader. Running tasks carry on
+        """
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        self.loop = None
+
+    def cancel(self):
+        """
+        Stops any further execution of the trigger along with its running tasks
+        """
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        for task in list(self.tasks):
+            task.cancel()
+        self.cancelled = True
+        self.loop = None
+
+
+class AsyncOneShotTrigger(AsyncTrigger):
+    """
+    Creates an asyncio One-Shot Trigger
+
+    :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
+    :param wait_time: indicates if there must be a delay before scheduling the first executions
+    """
+
+    def __init__(self, evt_cb: BaseEventFabric, wait_time: str = None):
+        super(AsyncOneShotTrigger, self).__init__(
+            evt_cb, one_shot=True, wait_time=wait_time)
+
+
+class AsyncPeriodicTrigger(AsyncTrigger):
+    """
+    Creates an asyncio Periodic Trigger
+
+    :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
+    :param duration: frequency of event generation using Golang's time representation, e.g., 1h1m1s
+    :param wait_time: indicates if there must be a delay before scheduling the first executions
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
+    """
+
+    def __init__(self, evt_cb: BaseEventFabric, duration: str, wait_time: str = None,
+                 name: str = None, catch_up: CatchUp | str = CatchUp.SKIP, jitter: str = None, window: str = None):
+        super(AsyncPeriodicTrigger, self).__init__(
+            evt_cb, duration, wait_time=wait_time, name=name, catch_up=catch_up, jitter=jitter, window=window)
+
+
+class AsyncCronTrigger(AsyncTrigger):
+    """
+    Creates an asyncio Trigger following a cron expression
+
+    :param evt_cb: :class:`BaseEvent <event.BaseEvent>` instance to be called
+    :param cron: :class:`cron expression <schedule.CronExpression>`, e.g., `0 2 * * *` for every day at 02:00
+    :param name: unique name under which the last execution is persisted
+    :param catch_up: :class:`CatchUp <CatchUp>` policy for the executions missed while the process was down
+    :param jitter: maximum random delay of each execution using Golang's time representation, e.g., 15m
+    :param window: daily local time window the executions must happen within, e.g., 02:00-05:00
+    """
+
+    def __init__(self, evt_cb: BaseEventFabric, cron: str, name: str = None,
+                 catch_up: CatchUp | str = CatchUp.SKIP, jitter: str = None, window: str = None):
+        super(AsyncCronTrigger, self).__init__(
+            evt_cb, name=name, catch_up=catch_up, cron=cron, jitter=jitter, window=window)
@@ -29,7 +29,8 @@ app.deploy(
     create_emergency_notification_function, 
     name="create_emergency_notification_function", 
     evts="EmergencyEvent", 
-    method="POST"
+    method="POST",
+    defer=True
 )
 base_logger.info("create_emergency_notification_function app deployed.")
 
@@ -38,6 +39,10 @@ app.deploy(
     create_burglary_notification_function, 
     name="create_burglary_notification_function", 
     evts="BurglaryEvent", 
-    method="POST"
+    method="POST",
+    defer=True
 )
-base_logger.info("create_burglary_notification_function app deployed.")
\ No newline at end of file
+base_logger.info("create_burglary_notification_function app deployed.")
+
+# Register both functions with the scheduler in one request
+app.register()
\ No newline at end of file
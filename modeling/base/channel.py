@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+from abc import ABC
+from http import HTTPStatus
+from threading import Condition, Lock, Thread
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp
+from websockets.exceptions import ConnectionClosed, WebSocketException
+from websockets.sync.client import ClientConnection, connect
+
+from .frames import FrameType, CREDITS, encode_json, encode_credits, encode_status, decode, decode_status
+from .routing import call_app
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceChannel(ABC):
+    """
+    Persistent WebSocket to SIF-edge's `/api/channel`, over which this
+    replica pushes its events and receives the invocations of its functions,
+    instead of one short-lived HTTP request each.
+
+    Messages are compact binary frames (see :mod:`frames`) and both ways are
+    flow controlled with credits. SIF-edge grants how many events may await
+    their acknowledgement, and the replica grants `credits` invocations at
+    once, returning them as they finish. Invocations run through the
+    application in-process, so they are handled exactly as over HTTP.
+
+    The channel reconnects with an exponential backoff when it drops.
+    Meanwhile, events go over HTTP and SIF-edge invokes the functions over
+    HTTP, as without a channel.
+
+    :param scheduler: URL of the SIF-edge scheduler
+    :param endpoint: `host:port` the replica registered its functions with
+    :param credits: Invocations handled at once, defaults to `CHANNEL_CREDITS` or 8
+    :param timeout: Seconds to wait for an event credit or acknowledgement, defaults to `CHANNEL_TIMEOUT` or 5
+    """
+
+    def __init__(self, scheduler: str, endpoint: str, credits: int = None, timeout: float = None):
+        super(ServiceChannel, self).__init__()
+        host = scheduler.split("://", 1)[-1].rstrip("/")
+        self.url = f"ws://{host}/api/channel"
+        self.endpoint = endpoint
+        self.credits: int = credits or int(os.environ.get("CHANNEL_CREDITS", "8"))
+        self.timeout: float = timeout if timeout is not None else float(os.environ.get("CHANNEL_TIMEOUT", "5"))
+        self.max_backoff = 30.0
+        self.cond = Condition()
+        self.send_lock = Lock()
+        self.ws: Optional[ClientConnection] = None
+        self.event_credits = 0
+        self.owed = 0
+        self.next_id = 0
+        self.pending: Dict[int, Future] = {}
+        self.app: Optional[ASGIApp] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stopped = False
+        self.thr: Optional[Thread] = None
+        self.stats = {"events": 0, "invocations": 0, "connects": 0}
+
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None
+
+    def start(self, app: ASGIApp, loop: asyncio.AbstractEventLoop):
+        """
+        Connects in the background, invocations run through `app` on `loop`
+        """
+        self.app, self.loop = app, loop
+        self.thr = Thread(target=self.run, daemon=True)
+        self.thr.start()
+
+    def stop(self):
+        self.stopped = True
+        ws = self.ws
+        if ws is not None:
+            ws.close()
+
+    def run(self):
+        backoff = 1.0
+        while not self.stopped:
+            try:
+                with connect(self.url, open_timeout=self.timeout, max_size=None) as ws:
+                    backoff = 1.0
+                    self.__serve(ws)
+            except (OSError, TimeoutError, ValueError, WebSocketException) as err:
+                if self.stopped:
+                    break
+                logger.warning(f"Channel to {self.url} unavailable because {err}, retrying in {backoff}s")
+            finally:
+                self.__close()
+            if not self.stopped:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def __serve(self, ws: ClientConnection):
+        ws.send(encode_json(FrameType.HELLO, 0, dict(endpoints=[self.endpoint], credits=self.credits)))
+        with self.cond:
+            self.ws = ws
+            self.stats["connects"] += 1
+        logger.info(f"Opened channel to {self.url}")
+        try:
+            for message in ws:
+                if isinstance(message, str):
+                    continue
+                kind, frame_id, payload = decode(message)
+                if kind == FrameType.INVOKE:
+                    asyncio.run_coroutine_threadsafe(self.__invoke(frame_id, payload), self.loop)
+                elif kind == FrameType.ACK:
+                    with self.cond:
+                        fut = self.pending.pop(frame_id, None)
+                    if fut is not None:
+                        status, reason = decode_status(payload)
+                        fut.set_result((status, reason if status >= 300 else None))
+                elif kind == FrameType.CREDIT:
+                    credits, = CREDITS.unpack_from(payload)
+                    with self.cond:
+                        self.event_credits += credits
+                        self.cond.notify_all()
+        except ConnectionClosed:
+            pass
+
+    def __close(self):
+        with self.cond:
+            was_open = self.ws is not None
+            self.ws = None
+            self.event_credits = 0
+            self.owed = 0
+            pending, self.pending = self.pending, {}
+            self.cond.notify_all()
+        for fut in pending.values():
+            fut.set_result((None, "channel closed before the acknowledgement"))
+        if was_open:
+            logger.warning(f"Closed channel to {self.url}")
+
+    def __send(self, *frames: bytes):
+        ws = self.ws
+        if ws is None:
+            raise ConnectionError("channel is closed")
+        with self.send_lock:
+            for frame in frames:
+                ws.send(frame)
+
+    def send_events(self, payloads: List[Dict[str, Any]]) -> Optional[List[Tuple[Optional[int], Optional[str]]]]:
+        """
+        Sends EventRequests over the channel, pipelined up to the granted
+        credits, and waits for their acknowledgements
+
+        :returns: the status and failure reason of each event, `None` if the channel is closed
+        """
+        if self.ws is None:
+            return None
+        futs: List[Future] = []
+        for payload in payloads:
+            with self.cond:
+                if not self.cond.wait_for(lambda: self.ws is None or self.event_credits > 0, self.timeout) \
+                        or self.ws is None:
+                    break
+                self.event_credits -= 1
+                self.next_id += 1
+                frame_id = self.next_id
+                fut = self.pending[frame_id] = Future()
+            try:
+                self.__send(encode_json(FrameType.EVENT, frame_id, payload))
+            except (ConnectionError, WebSocketException) as err:
+                with self.cond:
+                    self.pending.pop(frame_id, None)
+                if not fut.done():
+                    fut.set_result((None, str(err)))
+            futs.append(fut)
+
+        results = []
+        for fut in futs:
+            try:
+                results.append(fut.result(self.timeout))
+            except TimeoutError:
+                results.append((None, "no acknowledgement over the channel"))
+        self.stats["events"] += len(futs)
+        # Events without a credit are reported as undelivered, so they go over HTTP
+        return results + [(None, "no credit on the channel")] * (len(payloads) - len(futs))
+
+    async def __invoke(self, frame_id: int, payload: bytes):
+        status = None
+        try:
+            req = json.loads(payload)
+            body = b"" if req.get("body") is None else json.dumps(req["body"]).encode()
+            headers = [(b"content-type", b"application/json"),
+                       *((k.lower().encode(), str(v).encode()) for k, v in req.get("headers", {}).items())]
+            status = await call_app(self.app, req["method"], req["path"], headers, body)
+        except Exception as err:
+            logger.error(f"Failure handling invocation {frame_id} from the channel: {err}", exc_info=True)
+        status = status or 500
+        reason = next((s.phrase for s in HTTPStatus if s.value == status), "")
+        frames = [encode_status(FrameType.RESULT, frame_id, status, reason)]
+        with self.cond:
+            self.stats["invocations"] += 1
+            self.owed += 1
+            if self.owed >= max(self.credits // 2, 1):
+                frames.append(encode_credits(self.owed))
+                self.owed = 0
+        try:
+            # The WebSocket is blocking, so it must not hold up the event loop
+            await asyncio.get_running_loop().run_in_executor(None, lambda: self.__send(*frames))
+        except (ConnectionError, WebSocketException) as err:
+            logger.warning(f"Failure returning the result of invocation {frame_id}: {err}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.cond:
+            return {**self.stats, "connected": self.ws is not None, "event_credits": self.event_credits,
+                    "awaiting_ack": len(self.pending)}
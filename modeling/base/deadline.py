@@ -0,0 +1,60 @@
+import time
+
+from contextvars import ContextVar, Token
+from typing import Optional
+
+# Header carrying the absolute UNIX time (in seconds) until which SIF-edge's
+# dispatcher waits for the response of an invocation
+DEADLINE_HEADER = "X-SIF-Deadline"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("sif_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by :func:`check_deadline` once the caller stopped waiting for the
+    current invocation. :class:`LocalGateway <gateway.LocalGateway>` answers
+    it with `504 Gateway Timeout`.
+    """
+
+
+def set_deadline(deadline: Optional[float]) -> Token:
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: Token):
+    _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    """
+    Returns the deadline of the invocation being handled, if any
+    """
+    return _deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Returns the seconds left until the deadline of the invocation being
+    handled or `None` if the caller did not set one
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline(step: str = None):
+    """
+    Aborts the current handler if its deadline already passed. Long workflows
+    should call it between expensive steps.
+
+    :param step: Name of the step about to run, used in the error message
+    :raises DeadlineExceeded: if the deadline has passed
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        msg = "Invocation deadline exceeded"
+        if step is not None:
+            msg = f"{msg} before {step}"
+        raise DeadlineExceeded(msg)
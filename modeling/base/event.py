@@ -1,8 +1,10 @@
 import os
-import urllib3
 
 from abc import ABC, abstractmethod
-from typing import Tuple, Any
+from typing import Tuple, Any, Optional
+
+from .emitter import get_emitter
+from .bus import get_bus
 
 
 class BaseEventFabric(ABC):
@@ -28,17 +30,35 @@ class BaseEventFabric(ABC):
         raise NotImplementedError("Implement the 'call' method in your class")
 
     def __call__(self, *args, **kwargs):
+        """
+        Generates the event and queues it for delivery to the scheduler. It
+        returns right away, the delivery is reported to :meth:`on_delivery`.
+        Local subscribers are invoked in-process first, see :class:`LocalBus
+        <bus.LocalBus>`, and the event is queued once they finished
+        """
         evt_name, data = self.call(*args, **kwargs)
-        try:
-            http = urllib3.PoolManager()
-            res = http.request('POST', f"{self.scheduler}/api/event",
-                               json=dict(name=evt_name, data=data), retries=urllib3.Retry(5))
-            if res.status >= 300:
-                print(
-                    f"Failure to send EventRequest to the scheduler because {res.reason}")
-        except Exception as err:
-            print("Failure during request because:")
-            print(err)
+        emitter = get_emitter(self.scheduler)
+        get_bus().publish(evt_name, data, lambda handled: emitter.emit(evt_name, data, self.on_delivery, handled))
+
+    async def acall(self, *args, **kwargs) -> bool:
+        """
+        Asynchronous variant of `__call__` for FastAPI handlers, which waits
+        for the delivery without blocking the event loop
+
+        :returns: whether the scheduler accepted the event
+        """
+        evt_name, data = self.call(*args, **kwargs)
+        handled = await get_bus().publish_async(evt_name, data)
+        return await get_emitter(self.scheduler).emit_async(evt_name, data, self.on_delivery, handled)
+
+    def on_delivery(self, evt_name: str, delivered: bool, reason: Optional[str]):
+        """
+        Called from the emitter's thread once the event has been sent. Override
+        it to act upon failed deliveries
+        """
+        if not delivered:
+            print(
+                f"Failure to send EventRequest {evt_name} to the scheduler because {reason}")
 
 
 class ExampleEventFabric(BaseEventFabric):
@@ -1,7 +1,18 @@
+import io
+import os
+import re
+import heapq
+import atexit
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
-from influxdb_client import InfluxDBClient
+from threading import Lock
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable, TypeVar
+import pandas as pd
+from influxdb_client import InfluxDBClient, Dialect
+from influxdb_client.rest import ApiException
 
 from config import (
     INFLUX_TOKEN,
@@ -16,6 +27,350 @@ from config import (
 
 base_logger = logging.getLogger(__name__)
 
+_client: Optional[InfluxDBClient] = None
+_client_lock = Lock()
+
+def _pool_size() -> int:
+    return int(os.environ.get("INFLUX_POOL_SIZE", "4"))
+
+def _client_options() -> Dict[str, Any]:
+    return dict(
+        url=INFLUX_TOKEN,
+        org=INFLUX_ORG,
+        username=INFLUX_USER,
+        password=INFLUX_PASS,
+        verify_ssl=False,
+        timeout=int(os.environ.get("INFLUX_TIMEOUT_MS", "10000")),
+        enable_gzip=os.environ.get("INFLUX_GZIP", "true").lower() == "true",
+        connection_pool_maxsize=_pool_size()
+    )
+
+def get_client() -> InfluxDBClient:
+    """
+    Returns the process-wide InfluxDB client, created on first use and shared
+    by all queries, so they reuse its pool of keep-alive connections instead of
+    opening one each. Responses are gzip-compressed unless `INFLUX_GZIP` is
+    `false`, and requests time out after `INFLUX_TIMEOUT_MS` milliseconds.
+
+    The client signs in with `INFLUX_USER` and `INFLUX_PASS` once and keeps
+    the session cookie, which InfluxDB expires after an hour by default, so
+    queries run through :func:`_with_client` to sign in again upon a 401.
+
+    :return: Shared InfluxDB client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InfluxDBClient(**_client_options())
+        return _client
+
+def close_client():
+    """
+    Closes the process-wide InfluxDB client and its connections, e.g., upon
+    shutdown. The next query creates a new one.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+def _discard_client(stale: InfluxDBClient):
+    """
+    Closes `stale` unless another thread already replaced it, e.g., when
+    concurrent queries find the session expired at once.
+    """
+    global _client
+    with _client_lock:
+        if _client is not stale:
+            return
+        _client = None
+    stale.close()
+
+T = TypeVar("T")
+
+def _with_client(call: Callable[[InfluxDBClient], T]) -> T:
+    """
+    Runs `call` with the shared client, retrying it once with a new client
+    if InfluxDB rejects the session, e.g., after it expired.
+    """
+    client = get_client()
+    try:
+        return call(client)
+    except ApiException as err:
+        if err.status != 401:
+            raise
+        base_logger.info("InfluxDB session expired, signing in again")
+        _discard_client(client)
+        return call(get_client())
+
+def _forget_client():
+    global _client, _client_lock
+    _client = None
+    _client_lock = Lock()
+
+atexit.register(close_client)
+# Worker processes of the handlers must not share the connections of the parent
+os.register_at_fork(after_in_child=_forget_client)
+
+# A source is a bucket together with the measurement and fields to fetch from it
+Source = Tuple[str, str, List[str]]
+
+def build_sources_query(sources: List[Source], columns: Optional[List[str]] = None) -> str:
+    """
+    Build a single Flux script fetching every source, each tagged with the
+    `source_bucket` column so that its records can be mapped back to their
+    bucket. The time range is passed as the `_start` and `_stop` parameters.
+
+    :param sources: Buckets with the measurement and fields to fetch from each.
+    :param columns: Columns to keep in the result, all of them by default.
+    :return: Flux script joining the streams of all sources with `union`.
+    """
+    streams = []
+    for i, (bucket, measurement, fields) in enumerate(sources):
+        field_filter = " or ".join(f'r["_field"] == "{field}"' for field in fields)
+        streams.append(f'''
+            s{i} = from(bucket: "{bucket}")
+                |> range(start: _start, stop: _stop)
+                |> filter(fn: (r) => r["_measurement"] == "{measurement}")
+                |> filter(fn: (r) => r["_type"] == "sensor-value")
+                |> filter(fn: (r) => {field_filter})
+                |> set(key: "source_bucket", value: "{bucket}")''')
+
+    # union requires at least two streams
+    if len(sources) == 1:
+        result = "s0"
+    else:
+        tables = ", ".join(f"s{i}" for i in range(len(sources)))
+        result = f"union(tables: [{tables}])"
+    if columns:
+        keep = ", ".join(f'"{column}"' for column in columns)
+        result += f" |> keep(columns: [{keep}])"
+    return "".join(streams) + f"\n            {result}\n"
+
+def _query_params(start_hours: int, interval_hours: int) -> Dict[str, datetime]:
+    now = datetime.utcnow()
+    _start = now - timedelta(hours=start_hours)
+    _stop = _start + timedelta(hours=interval_hours)
+    return {"_start": _start, "_stop": _stop}
+
+def _to_records(tables, sources: List[Source]) -> List[Dict[str, Any]]:
+    """
+    Map the tables returned by a query from :func:`build_sources_query` to
+    records, ordered by source and field as given, then by time.
+    """
+    pairs = [(bucket, field) for bucket, _, fields in sources for field in fields]
+    order = {pair: i for i, pair in enumerate(pairs)}
+    obj = []
+    for table in tables:
+        for record in table.records:
+            bucket = record["source_bucket"]
+            val = {
+                "sensor": BUCKET_DICT[bucket],
+                "bucket": bucket,
+                "timestamp": record["_time"].timestamp() * 1000,
+                "value": record["_value"]
+            }
+            if bucket in BATTERY_BUCKETS:
+                val["field"] = record["_field"]
+                val["type"] = "battery"
+            else:
+                val["type"] = "sensor"
+
+            obj.append((order.get((bucket, record["_field"]), len(order)), val))
+
+    # union() does not keep the rows in time order
+    obj.sort(key=lambda item: (item[0], item[1]["timestamp"]))
+    return [val for _, val in obj]
+
+def _merge_by_time(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    by_time = itemgetter("timestamp")
+    return list(heapq.merge(*[sorted(records, key=by_time) for records in results], key=by_time))
+
+def _parallelism(parallelism: Optional[int]) -> int:
+    return parallelism or int(os.environ.get("INFLUX_PARALLELISM", "4"))
+
+def fetch_sources(sources: List[Source], start_hours: int = 24, interval_hours: int = 6) -> List[Dict[str, Any]]:
+    """
+    Fetch data from several buckets, measurements, and fields in a single
+    Flux query, starting from `start_hours` in the past and spanning
+    `interval_hours` hours into the future (towards now).
+
+    The records are ordered by source and field as given, then by time.
+
+    :param sources: Buckets with the measurement and fields to fetch from each.
+    :param start_hours: Number of hours in the past to start fetching data.
+    :param interval_hours: Number of hours to span forward from the start time.
+    :return: List of fetched data as dictionaries.
+    """
+    sources = [(bucket, measurement, fields) for bucket, measurement, fields in sources if fields]
+    if not sources:
+        return []
+
+    query = build_sources_query(sources)
+    params = _query_params(start_hours, interval_hours)
+    tables = _with_client(lambda client: client.query_api().query(query, params=params))
+    return _to_records(tables, sources)
+
+def fetch_sources_concurrently(
+    sources: List[Source],
+    start_hours: int = 24,
+    interval_hours: int = 6,
+    parallelism: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch data from several buckets with one query per source, run
+    concurrently on a thread pool, e.g., when the buckets have different
+    retention or the window is too large for a single query. The fetch takes
+    about as long as the slowest bucket rather than the sum of all of them.
+
+    :param sources: Buckets with the measurement and fields to fetch from each.
+    :param start_hours: Number of hours in the past to start fetching data.
+    :param interval_hours: Number of hours to span forward from the start time.
+    :param parallelism: Queries run at once, defaults to `INFLUX_PARALLELISM` or 4, at most `INFLUX_POOL_SIZE`.
+    :return: List of fetched data as dictionaries, ordered by timestamp.
+    """
+    sources = [(bucket, measurement, fields) for bucket, measurement, fields in sources if fields]
+    if not sources:
+        return []
+
+    # More threads than pooled connections would open and discard connections of the shared client
+    workers = min(_parallelism(parallelism), _pool_size(), len(sources))
+    params = _query_params(start_hours, interval_hours)
+
+    def query(source: Source) -> List[Dict[str, Any]]:
+        flux = build_sources_query([source])
+        return _to_records(_with_client(lambda client: client.query_api().query(flux, params=params)), [source])
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="influx-fetch") as pool:
+        results = list(pool.map(query, sources))
+    return _merge_by_time(results)
+
+async def fetch_sources_async(
+    sources: List[Source],
+    start_hours: int = 24,
+    interval_hours: int = 6,
+    parallelism: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch data from several buckets with one query per source, run
+    concurrently on the event loop through `InfluxDBClientAsync`, so that
+    async handlers can fetch without blocking it. The queries share the
+    connections of a single client for the duration of the fetch, whose
+    pool is sized after the parallelism.
+
+    :param sources: Buckets with the measurement and fields to fetch from each.
+    :param start_hours: Number of hours in the past to start fetching data.
+    :param interval_hours: Number of hours to span forward from the start time.
+    :param parallelism: Queries run at once, defaults to `INFLUX_PARALLELISM` or 4.
+    :return: List of fetched data as dictionaries, ordered by timestamp.
+    """
+    # Imported here as the async client needs aiohttp, which the sync helpers do not
+    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+    sources = [(bucket, measurement, fields) for bucket, measurement, fields in sources if fields]
+    if not sources:
+        return []
+
+    params = _query_params(start_hours, interval_hours)
+    parallelism = _parallelism(parallelism)
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async with InfluxDBClientAsync(**{**_client_options(), "connection_pool_maxsize": parallelism}) as client:
+        query_api = client.query_api()
+
+        async def query(source: Source) -> List[Dict[str, Any]]:
+            async with semaphore:
+                tables = await query_api.query(build_sources_query([source]), params=params)
+            return _to_records(tables, [source])
+
+        results = await asyncio.gather(*[query(source) for source in sources])
+    return _merge_by_time(results)
+
+# Columns of the raw CSV read by fetch_sources_frame, annotated with their Flux types only
+_FRAME_COLUMNS = ["_time", "_value", "_field", "source_bucket"]
+_FRAME_DIALECT = Dialect(header=True, delimiter=",", comment_prefix="#", annotations=["datatype"],
+                         date_time_format="RFC3339Nano")
+# pandas dtype of the values of each Flux type, strings become categories rather than a Python str per row
+_FRAME_DTYPES = {"string": "category", "long": "int64", "unsignedLong": "uint64", "double": "float64",
+                 "boolean": "bool"}
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "sensor": pd.Categorical([]),
+        "bucket": pd.Categorical([]),
+        "timestamp": pd.Series([], dtype="datetime64[ns]"),
+        "value": pd.Series([], dtype="float64"),
+        "type": pd.Categorical([], categories=["sensor", "battery"]),
+        "field": pd.Categorical([])
+    })
+
+def _read_csv_table(chunk: bytes) -> pd.DataFrame:
+    """
+    Parse one table of the annotated CSV response, typing its values after its `#datatype` annotation
+    """
+    annotation, _, table = chunk.strip(b"\r\n").partition(b"\n")
+    header = table.partition(b"\n")[0]
+    types = dict(zip(header.decode().rstrip("\r").split(","), annotation.decode().rstrip("\r").split(",")))
+    return pd.read_csv(io.BytesIO(table), usecols=_FRAME_COLUMNS, parse_dates=["_time"], date_format="ISO8601", dtype={
+        "_value": _FRAME_DTYPES.get(types.get("_value"), "object"), "_field": "category", "source_bucket": "category"})
+
+def _concat_column(frames: List[pd.DataFrame], column: str) -> pd.Series:
+    values = [frame[column] for frame in frames]
+    if all(isinstance(v.dtype, pd.CategoricalDtype) for v in values):
+        # pd.concat would turn categories that differ between tables into objects
+        return pd.Series(pd.api.types.union_categoricals(values))
+    return pd.concat(values, ignore_index=True)
+
+def fetch_sources_frame(sources: List[Source], start_hours: int = 24, interval_hours: int = 6) -> pd.DataFrame:
+    """
+    Fetch data from several buckets, measurements, and fields in a single
+    Flux query as a DataFrame, parsing the raw CSV response column by column
+    instead of creating a dictionary per record.
+
+    The DataFrame has the same columns as the records of :func:`fetch_sources`,
+    except that `sensor` holds the sensor name rather than a list, `timestamp`
+    holds datetimes (UTC, nanoseconds stored as int64), and `sensor`, `bucket`,
+    `type` and `field` are categorical. `field` is missing on sensor rows, as
+    in the records. `value` has the dtype of the Flux values, categorical for
+    strings, or object if tables of different types are mixed. Rows are
+    ordered by timestamp.
+
+    :param sources: Buckets with the measurement and fields to fetch from each.
+    :param start_hours: Number of hours in the past to start fetching data.
+    :param interval_hours: Number of hours to span forward from the start time.
+    :return: DataFrame of the fetched data.
+    """
+    sources = [(bucket, measurement, fields) for bucket, measurement, fields in sources if fields]
+    if not sources:
+        return _empty_frame()
+
+    query = build_sources_query(sources, columns=_FRAME_COLUMNS)
+    params = _query_params(start_hours, interval_hours)
+    response = _with_client(lambda client: client.query_api().query_raw(query, params=params, dialect=_FRAME_DIALECT))
+    try:
+        data = response.data
+    finally:
+        response.release_conn()
+
+    # Tables whose values differ in type are separated by a blank line and repeat the annotation and header
+    frames = [_read_csv_table(chunk) for chunk in re.split(rb"\r?\n\r?\n", data) if chunk.strip()]
+    if not frames:
+        return _empty_frame()
+    raw = pd.DataFrame({column: _concat_column(frames, column) for column in _FRAME_COLUMNS})
+
+    buckets = raw["source_bucket"]
+    battery = buckets.isin(BATTERY_BUCKETS)
+    df = pd.DataFrame({
+        "sensor": buckets.cat.rename_categories(lambda bucket: BUCKET_DICT[bucket][0]),
+        "bucket": buckets,
+        "timestamp": pd.to_datetime(raw["_time"], utc=True, format="ISO8601").dt.tz_localize(None).astype("datetime64[ns]"),
+        "value": raw["_value"],
+        "type": pd.Categorical.from_codes(battery.astype("int8"), ["sensor", "battery"]),
+        "field": raw["_field"].where(battery)
+    })
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
 def fetch_data(bucket: str, measurement: str, field: str, start_hours: int = 24, interval_hours: int = 6) -> List[Dict[str, Any]]:
     """
     Fetch data from InfluxDB starting from `start_hours` in the past and spanning
@@ -28,49 +383,7 @@ def fetch_data(bucket: str, measurement: str, field: str, start_hours: int = 24,
     :param interval_hours: Number of hours to span forward from the start time.
     :return: List of fetched data as dictionaries.
     """
-    now = datetime.utcnow()
-    _start = now - timedelta(hours=start_hours)
-    _stop = _start + timedelta(hours=interval_hours)
-
-    with InfluxDBClient(
-        url=INFLUX_TOKEN,
-        org=INFLUX_ORG,
-        username=INFLUX_USER,
-        password=INFLUX_PASS,
-        verify_ssl=False
-    ) as client:
-        query_api = client.query_api()
-
-        params = {"_start": _start, "_stop": _stop}
-
-        flux_query = f'''
-            from(bucket: "{bucket}")
-                |> range(start: _start, stop: _stop)
-                |> filter(fn: (r) => r["_measurement"] == "{measurement}")
-                |> filter(fn: (r) => r["_type"] == "sensor-value")
-                |> filter(fn: (r) => r["_field"] == "{field}")
-        '''
-
-        tables = query_api.query(flux_query, params=params)
-
-        obj = []
-        for table in tables:
-            for record in table.records:
-                val = {
-                    "sensor": BUCKET_DICT[bucket],
-                    "bucket": bucket,
-                    "timestamp": record["_time"].timestamp() * 1000,
-                    "value": record["_value"]
-                }
-                if bucket in BATTERY_BUCKETS:
-                    val["field"] = record["_field"]
-                    val["type"] = "battery"
-                else:
-                    val["type"] = "sensor"
-
-                obj.append(val)
-
-        return obj
+    return fetch_sources([(bucket, measurement, [field])], start_hours, interval_hours)
 
 def fetch_data_from_buckets(
     buckets: List[str],
@@ -89,19 +402,7 @@ def fetch_data_from_buckets(
     :param interval_hours: Number of hours to span forward from the start time.
     :return: Aggregated list of fetched data.
     """
-    all_data = []
-    for bucket in buckets:
-        for field in fields:
-            all_data.extend(
-                fetch_data(
-                    bucket=bucket,
-                    measurement=measurement,
-                    field=field,
-                    start_hours=start_hours,
-                    interval_hours=interval_hours
-                )
-            )
-    return all_data
+    return fetch_sources([(bucket, measurement, fields) for bucket in buckets], start_hours, interval_hours)
 
 def fetch_all_data(start_hours: int = 24, interval_hours: int = 6) -> List[Dict[str, Any]]:
     """
@@ -111,12 +412,10 @@ def fetch_all_data(start_hours: int = 24, interval_hours: int = 6) -> List[Dict[
     :param interval_hours: Number of hours to span forward from the start time.
     :return: Aggregated list of all fetched data.
     """
-    all_data = []
-    all_data.extend(fetch_data_from_buckets(PIR_BUCKETS, "PIR", ["roomID"], start_hours, interval_hours))
-    all_data.extend(fetch_data_from_buckets(MAGNETIC_SWITCH_BUCKETS, "MagneticSwitch", ["roomID"], start_hours, interval_hours))
-    all_data.extend(fetch_data_from_buckets(BATTERY_BUCKETS, "battery", ["soc", "voltage"], start_hours, interval_hours))
-
-    return all_data
+    sources = [(bucket, "PIR", ["roomID"]) for bucket in PIR_BUCKETS]
+    sources += [(bucket, "MagneticSwitch", ["roomID"]) for bucket in MAGNETIC_SWITCH_BUCKETS]
+    sources += [(bucket, "battery", ["soc", "voltage"]) for bucket in BATTERY_BUCKETS]
+    return fetch_sources(sources, start_hours, interval_hours)
 
 def fetch_battery_info(start_hours: int = 24, interval_hours: int = 6) -> List[Dict[str, Any]]:
     """
@@ -136,10 +435,21 @@ def fetch_all_sensor_data(start_hours: int = 24, interval_hours: int = 6) -> Lis
     :param interval_hours: Number of hours to span forward from the start time.
     :return: Aggregated list of all fetched sensor data.
     """
-    all_sensor_data = []
-    all_sensor_data.extend(fetch_data_from_buckets(PIR_BUCKETS, "PIR", ["roomID"], start_hours, interval_hours))
-    all_sensor_data.extend(fetch_data_from_buckets(MAGNETIC_SWITCH_BUCKETS, "MagneticSwitch", ["roomID"], start_hours, interval_hours))
-    return all_sensor_data
+    sources = [(bucket, "PIR", ["roomID"]) for bucket in PIR_BUCKETS]
+    sources += [(bucket, "MagneticSwitch", ["roomID"]) for bucket in MAGNETIC_SWITCH_BUCKETS]
+    return fetch_sources(sources, start_hours, interval_hours)
+
+def fetch_all_sensor_frame(start_hours: int = 24, interval_hours: int = 6) -> pd.DataFrame:
+    """
+    Fetch all sensor data (PIR and Magnetic Switch) within the specified time range as a DataFrame.
+
+    :param start_hours: Number of hours in the past to start fetching data.
+    :param interval_hours: Number of hours to span forward from the start time.
+    :return: DataFrame of all fetched sensor data, see :func:`fetch_sources_frame`.
+    """
+    sources = [(bucket, "PIR", ["roomID"]) for bucket in PIR_BUCKETS]
+    sources += [(bucket, "MagneticSwitch", ["roomID"]) for bucket in MAGNETIC_SWITCH_BUCKETS]
+    return fetch_sources_frame(sources, start_hours, interval_hours)
 
 def delete_last_x_hours(bucket: str, x_hours: int):
     """
@@ -150,41 +460,32 @@ def delete_last_x_hours(bucket: str, x_hours: int):
     :return: True if deletion was successful, False otherwise.
     """
     try:
-        with InfluxDBClient(
-            url=INFLUX_TOKEN,
-            org=INFLUX_ORG,
-            username=INFLUX_USER,
-            password=INFLUX_PASS,
-            verify_ssl=False
-        ) as client:
-            delete_api: DeleteApi = client.delete_api()
-
-            # Define the time range for deletion (from now - x_hours to now)
-            now = datetime.utcnow().replace(tzinfo=timezone.utc)
-            start_time = now - timedelta(hours=x_hours)
-
-            # Format times in RFC3339Nano
-            # Ensure that the format ends with 'Z' to indicate UTC timezone
-            start = start_time.isoformat(timespec='microseconds').replace('+00:00', 'Z')
-            stop = now.isoformat(timespec='microseconds').replace('+00:00', 'Z')
-
-            # Predicate to match all data within the time range
-            predicate = '_measurement != ""'  # Adjust if you need to target specific measurements
-
-            base_logger.info(f"Initiating deletion of items in bucket: {bucket} from {start} to {stop}")
-            base_logger.debug(f"Deletion predicate: {predicate}")
-
-            # Perform the deletion
-            delete_api.delete(
-                start=start,
-                stop=stop,
-                predicate=predicate,
-                bucket=bucket,
-                org=INFLUX_ORG
-            )
-
-            base_logger.info(f"Successfully deleted items from the last {x_hours} hours in bucket: {bucket}")
-            return True
+        # Define the time range for deletion (from now - x_hours to now)
+        now = datetime.utcnow().replace(tzinfo=timezone.utc)
+        start_time = now - timedelta(hours=x_hours)
+
+        # Format times in RFC3339Nano
+        # Ensure that the format ends with 'Z' to indicate UTC timezone
+        start = start_time.isoformat(timespec='microseconds').replace('+00:00', 'Z')
+        stop = now.isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+        # Predicate to match all data within the time range
+        predicate = '_measurement != ""'  # Adjust if you need to target specific measurements
+
+        base_logger.info(f"Initiating deletion of items in bucket: {bucket} from {start} to {stop}")
+        base_logger.debug(f"Deletion predicate: {predicate}")
+
+        # Perform the deletion
+        _with_client(lambda client: client.delete_api().delete(
+            start=start,
+            stop=stop,
+            predicate=predicate,
+            bucket=bucket,
+            org=INFLUX_ORG
+        ))
+
+        base_logger.info(f"Successfully deleted items from the last {x_hours} hours in bucket: {bucket}")
+        return True
 
     except Exception as e:
         base_logger.error(f"Error deleting items from bucket '{bucket}': {e}")
@@ -0,0 +1,111 @@
+import asyncio
+
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class DynamicRoutes(BaseRoute):
+    """
+    Single route of the :class:`LocalGateway <gateway.LocalGateway>` serving
+    every function deployed once the application has started.
+
+    Routes are kept in a dict keyed by their method and path, so deploying a
+    function at runtime neither rebuilds the application nor grows its
+    router, and finding the route of a request takes a single lookup no
+    matter how many functions were deployed. Each route still goes through
+    FastAPI's request handling, e.g., body parsing and validation.
+    """
+
+    def __init__(self):
+        super(DynamicRoutes, self).__init__()
+        self.routes: Dict[Tuple[str, str], APIRoute] = {}
+        self.paths: Set[str] = set()
+        self.version = 0
+
+    def add(self, path: str, endpoint: Callable[..., Any], methods: List[str]):
+        """
+        Adds or replaces the route of `endpoint` at `path`
+        """
+        for method in methods:
+            self.routes[(method.upper(), path)] = APIRoute(path, endpoint, methods=[method.upper()])
+        self.paths.add(path)
+        self.version += 1
+
+    @staticmethod
+    def route_path(scope: Scope) -> str:
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] != "http":
+            return Match.NONE, {}
+        path = self.route_path(scope)
+        route = self.routes.get((scope["method"], path))
+        if route is not None:
+            return route.matches(scope)
+        if path in self.paths:
+            # Known path but another method, answered with a 405
+            return Match.PARTIAL, {}
+        return Match.NONE, {}
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send):
+        path = self.route_path(scope)
+        route = self.routes.get((scope["method"], path))
+        if route is None:
+            route = next(r for (_, p), r in self.routes.items() if p == path)
+        await route.handle(scope, receive, send)
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        for route in self.routes.values():
+            try:
+                return route.url_path_for(name, **path_params)
+            except NoMatchFound:
+                pass
+        raise NoMatchFound(name, path_params)
+
+
+async def call_app(app: ASGIApp, method: str, path: str, headers: List[Tuple[bytes, bytes]] = None,
+                   body: bytes = b"") -> Optional[int]:
+    """
+    Sends a request through the application in-process, without a socket,
+    so it goes through the same middleware, routing and validation as a
+    request over HTTP
+
+    :param path: Path of the request, optionally followed by its query string
+    :returns: the status of the response, `None` if the application did not send one
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": method.upper(), "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "client": None, "server": None, "state": {},
+        "headers": [*(headers or []), (b"content-length", str(len(body)).encode())],
+    }
+    sent, done = False, asyncio.Event()
+    status = None
+
+    async def receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        done.set()
+    return status
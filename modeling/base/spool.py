@@ -0,0 +1,199 @@
+import os
+import json
+import fcntl
+import logging
+import weakref
+
+from abc import ABC
+from contextlib import contextmanager
+from threading import Condition
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EventSpool(ABC):
+    """
+    Append-only file holding events which could not be delivered to the
+    scheduler.
+
+    Events are appended as JSON lines to `events.spool` under `directory`,
+    while `events.offset` records up to which byte the spool has been
+    drained. Once everything has been drained, both files are truncated, so
+    the spool does not grow while the scheduler is reachable.
+
+    Processes sharing `directory`, e.g., the workers of the gateway or the
+    pool processes of the handlers, share the spool. Appending, reading and
+    truncating hold an `fcntl.flock` on `events.lock`, so the spool is only
+    truncated once the events appended by every process were drained. The
+    spool is drained by a single process, the one holding the `flock` on
+    `events.drain`, so events are not replayed twice. The others only append
+    to it, and one of them takes over once the draining process exits.
+
+    :param directory: Directory holding the spool files, created if missing
+    """
+
+    def __init__(self, directory: str):
+        super(EventSpool, self).__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "events.spool")
+        self.offset_path = os.path.join(directory, "events.offset")
+        self.lock_path = os.path.join(directory, "events.lock")
+        self.drain_path = os.path.join(directory, "events.drain")
+        self.drain_fd: Optional[int] = None
+        self.cond = Condition()
+        self.offset = 0
+        self.depth = 0
+        with self.__locked():
+            self.__sync()
+        if self.depth > 0:
+            logger.info(f"Restored {self.depth} spooled events from {self.path}")
+        _spools.add(self)
+
+    @contextmanager
+    def __locked(self):
+        with self.cond:
+            # A descriptor of its own, flock does not exclude holders of the same one, e.g., forked children
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def __claim(self) -> bool:
+        """
+        Takes over draining the spool unless another process drains it
+
+        :returns: whether this process drains the spool
+        """
+        if self.drain_fd is not None:
+            return True
+        fd = os.open(self.drain_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.drain_fd = fd
+        with self.__locked():
+            self.__sync()
+        return True
+
+    def __sync(self):
+        # Other processes may have appended or drained events meanwhile
+        size = os.path.getsize(self.path) if os.path.isfile(self.path) else 0
+        offset = 0
+        if os.path.isfile(self.offset_path):
+            with open(self.offset_path) as fd:
+                offset = int(fd.read().strip() or 0)
+        # The spool was truncated but the process died before resetting the offset
+        self.offset = min(offset, size)
+        self.depth = self.__count()
+
+    def __count(self) -> int:
+        if not os.path.isfile(self.path):
+            return 0
+        with open(self.path, "rb") as fd:
+            fd.seek(self.offset)
+            return sum(1 for _ in fd)
+
+    def append(self, name: str, data: Any = None, handled: Optional[List[str]] = None):
+        """
+        Stores an event until it can be delivered
+        """
+        evt = dict(name=name, data=data)
+        if handled:
+            evt["handled"] = handled
+        line = json.dumps(evt) + "\n"
+        with self.__locked():
+            with open(self.path, "ab") as fd:
+                fd.write(line.encode())
+                fd.flush()
+                os.fsync(fd.fileno())
+            self.depth += 1
+            self.cond.notify()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Blocks until the spool holds events to be drained by this process.
+        Events spooled by other processes are noticed after `timeout`.
+
+        :returns: whether there are events to drain
+        """
+        with self.cond:
+            if not self.__claim():
+                if not self.cond.wait(timeout):
+                    with self.__locked():
+                        self.__sync()
+                return False
+            if self.depth == 0 and not self.cond.wait(timeout):
+                with self.__locked():
+                    self.__sync()
+            return self.depth > 0
+
+    def peek(self, count: int = 1) -> List[Tuple[int, str, Any, Optional[List[str]]]]:
+        """
+        Returns up to `count` of the oldest events along with the offset
+        following each of them, without removing them. Processes not
+        draining the spool get none.
+        """
+        events = []
+        with self.__locked():
+            if self.depth == 0 or self.drain_fd is None:
+                return events
+            with open(self.path, "rb") as fd:
+                fd.seek(self.offset)
+                while len(events) < count:
+                    line = fd.readline()
+                    if not line:
+                        break
+                    try:
+                        evt = json.loads(line)
+                        events.append((fd.tell(), evt["name"], evt.get("data"), evt.get("handled")))
+                    except (ValueError, KeyError):
+                        if events:
+                            break
+                        # Partially written line, e.g., the process died while appending
+                        logger.warning(f"Skipping corrupted spool entry at {fd.tell()}")
+                        self.__commit(fd.tell())
+        return events
+
+    def commit(self, offset: int):
+        """
+        Removes the events up to `offset` once they have been delivered
+        """
+        with self.__locked():
+            self.__commit(offset)
+
+    def __commit(self, offset: int):
+        if offset <= self.offset:
+            return
+        self.offset = offset
+        self.depth = max(self.depth - 1, 0)
+        if self.offset >= os.path.getsize(self.path):
+            # Everything has been drained, start over with empty files
+            open(self.path, "wb").close()
+            self.offset, self.depth = 0, 0
+        elif self.depth == 0:
+            # Other processes appended events meanwhile
+            self.__sync()
+        with open(self.offset_path, "w") as fd:
+            fd.write(str(self.offset))
+
+    def __len__(self):
+        return self.depth
+
+
+_spools: "weakref.WeakSet[EventSpool]" = weakref.WeakSet()
+
+
+def _release_drain():
+    # Forked children must not keep the parent draining after it exited
+    for spool in list(_spools):
+        if spool.drain_fd is not None:
+            os.close(spool.drain_fd)
+            spool.drain_fd = None
+
+
+os.register_at_fork(after_in_child=_release_drain)
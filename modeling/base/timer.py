@@ -0,0 +1,123 @@
+import time
+import heapq
+import logging
+import itertools
+
+from abc import ABC
+from threading import Thread, Condition, Lock
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle(ABC):
+    """
+    Handle of a callback scheduled on the :class:`TimerService <TimerService>`
+
+    :param cb: Callback to be called once the timer expires
+    :param interval: Seconds between executions, `None` for one-shot timers
+    """
+
+    def __init__(self, cb: Callable[[], None], interval: Optional[float] = None):
+        super(TimerHandle, self).__init__()
+        self.cb = cb
+        self.interval = interval
+        self.deadline: float = 0.0
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stops the timer, it is discarded once it reaches the head of the heap
+        """
+        self.cancelled = True
+
+
+class TimerService(ABC):
+    """
+    Process-wide timer running every trigger on a single thread.
+
+    Timers are kept in a heap ordered by their deadline, and the thread sleeps
+    until the earliest one expires instead of polling, so neither the number
+    of threads nor the idle wakeups grow with the number of triggers.
+    Periodic timers are rescheduled at a fixed rate from their previous
+    deadline; if a callback overruns, the missed executions are skipped.
+
+    Callbacks run on the timer thread, so they must not block. Firing an
+    event through a :class:`BaseEventFabric <event.BaseEventFabric>` only
+    queues it in the emitter.
+
+    Use :func:`get_timer_service` instead of instantiating it.
+    """
+
+    def __init__(self):
+        super(TimerService, self).__init__()
+        self.heap: List[Tuple[float, int, TimerHandle]] = []
+        self.counter = itertools.count()
+        self.cond = Condition()
+        self.thr = Thread(target=self.run, daemon=True)
+        self.thr.start()
+
+    def schedule(self, delay: float, cb: Callable[[], None], interval: Optional[float] = None) -> TimerHandle:
+        """
+        Schedules a callback
+
+        :param delay: Seconds until the first execution
+        :param cb: Callback to be called
+        :param interval: Seconds between executions, `None` to run it only once
+        :returns: a handle to cancel the timer
+        """
+        timer = TimerHandle(cb, interval)
+        self.__push(timer, time.monotonic() + max(delay, 0))
+        return timer
+
+    def __push(self, timer: TimerHandle, deadline: float):
+        timer.deadline = deadline
+        with self.cond:
+            heapq.heappush(self.heap, (deadline, next(self.counter), timer))
+            # Wake up the thread only if the new timer expires first
+            if self.heap[0][2] is timer:
+                self.cond.notify()
+
+    def __len__(self):
+        with self.cond:
+            return sum(1 for _, _, timer in self.heap if not timer.cancelled)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(
+                        self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, timer = heapq.heappop(self.heap)
+
+            if timer.cancelled:
+                continue
+            try:
+                timer.cb()
+            except Exception as err:
+                logger.error(f"Failure in timer callback {timer.cb}: {err}")
+
+            if timer.interval is not None and not timer.cancelled:
+                deadline = timer.deadline + timer.interval
+                now = time.monotonic()
+                if deadline <= now:
+                    # Skip the executions missed while the callback ran
+                    missed = int((now - deadline) // timer.interval) + 1
+                    deadline += missed * timer.interval
+                self.__push(timer, deadline)
+
+
+_service: Optional[TimerService] = None
+_service_lock = Lock()
+
+
+def get_timer_service() -> TimerService:
+    """
+    Returns the process-wide timer service, starting its thread upon the
+    first call
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TimerService()
+        return _service
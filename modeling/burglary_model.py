@@ -1,5 +1,6 @@
 from motion_model import train_motion_model
 from base.minio_utils import load_model_from_minio, save_model_to_minio
+from base.deadline import check_deadline
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
@@ -231,12 +232,16 @@ def train_burglary_model(start_hours, interval_hours, time_threshold_seconds):
     - start_hours (int): Starting hours for motion data analysis.
     - interval_hours (int): Number of hours over which to aggregate motion data (e.g., 24*7*8 for 8 weeks).
     - time_threshold_seconds (int): Threshold in seconds to filter motion durations (e.g., 1800 seconds).
+
+    Raises DeadlineExceeded between the steps once the invocation's deadline has passed.
     """
     motion_model = train_motion_model(start_hours=start_hours, interval_hours=interval_hours, time_threshold_seconds=1800)
+    check_deadline("training the burglary model")
     # Initialize the detector
     detector = BurglaryDetector(contamination=0.01, model_type='burglary')
     # Train the model
     detector.train(motion_model)
+    check_deadline("saving the burglary model")
     # Save the trained model to MinIO
     try:
         detector.save_model()
@@ -7,6 +7,11 @@ CURRENT_IP = "192.168.81.143" # Munich IP home
 # How old data to use for retraining
 TRAINING_DATA_WINDOW_HOURS = 24 * 7 * 2
 
+# How long the scheduler waits for each training before aborting it
+TRAIN_OCCUPANCY_MODEL_TIMEOUT = "30m"
+TRAIN_MOTION_MODEL_TIMEOUT = "30m"
+TRAIN_BURGLARY_MODEL_TIMEOUT = "1h"
+
 # Influx configuration
 INFLUX_ORG = "wise2024"
 INFLUX_TOKEN = os.environ.get("INFLUXDB_HOST", f"{CURRENT_IP}:8086")
@@ -2,13 +2,18 @@ import logging
 from logging.handlers import RotatingFileHandler
 from fastapi import Request
 from base import LocalGateway, base_logger
-from base.influx_utils import fetch_all_sensor_data
+from base.influx_utils import fetch_all_sensor_frame
 from base.minio_utils import save_model_to_minio
 from base.homecare_hub_utils import send_info
 from occupancy_model import prepare_data_for_occupancy_model, train_occupancy_model
 from burglary_model import train_burglary_model
 from motion_model import train_motion_model
-from config import TRAINING_DATA_WINDOW_HOURS
+from config import (
+    TRAINING_DATA_WINDOW_HOURS,
+    TRAIN_OCCUPANCY_MODEL_TIMEOUT,
+    TRAIN_MOTION_MODEL_TIMEOUT,
+    TRAIN_BURGLARY_MODEL_TIMEOUT
+)
 
 # Configure logging
 logging.basicConfig(
@@ -26,7 +31,7 @@ async def create_occupancy_model_function(request: Request):
     base_logger.info(f"Received data: {data}")
 
     # Fetch sensor data
-    sensor_data = fetch_all_sensor_data(start_hours=TRAINING_DATA_WINDOW_HOURS, interval_hours=TRAINING_DATA_WINDOW_HOURS)
+    sensor_data = fetch_all_sensor_frame(start_hours=TRAINING_DATA_WINDOW_HOURS, interval_hours=TRAINING_DATA_WINDOW_HOURS)
     sensor_data_df = prepare_data_for_occupancy_model(sensor_data)
 
     # Train the model
@@ -68,25 +73,32 @@ async def create_burglary_model_function(request: Request):
 
     return {"status": "success"}
 
-# List of functions to deploy
+# List of functions to deploy, training is CPU-bound so it runs on worker processes
+# and in job mode, so the dispatcher does not wait for it
 functions_to_deploy = [
     {
         "func": create_occupancy_model_function,
         "name": "create_occupancy_model_function",
         "evts": "TrainOccupancyModelEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": TRAIN_OCCUPANCY_MODEL_TIMEOUT,
+        "executor": "process"
     },
     {
         "func": create_motion_model_function,
         "name": "create_motion_model_function",
         "evts": "TrainMotionModelEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": TRAIN_MOTION_MODEL_TIMEOUT,
+        "executor": "process"
     },
     {
         "func": create_burglary_model_function,
         "name": "create_burglary_model_function",
         "evts": "TrainBurglaryModelEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": TRAIN_BURGLARY_MODEL_TIMEOUT,
+        "executor": "process"
     }
 ]
 
@@ -96,6 +108,13 @@ for func_config in functions_to_deploy:
         func_config["func"],
         name=func_config["name"],
         evts=func_config["evts"],
-        method=func_config["method"]
+        method=func_config["method"],
+        timeout=func_config["timeout"],
+        executor=func_config["executor"],
+        job=True,
+        defer=True
     )
-    base_logger.info(f"{func_config['name']} deployed.")
\ No newline at end of file
+    base_logger.info(f"{func_config['name']} deployed.")
+
+# Register all functions with the scheduler in one request
+app.register()
\ No newline at end of file
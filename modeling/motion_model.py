@@ -1,7 +1,7 @@
 import logging
 import pandas as pd
 from occupancy_model import prepare_data_for_occupancy_model
-from base.influx_utils import fetch_all_sensor_data
+from base.influx_utils import fetch_all_sensor_frame
 
 base_logger = logging.getLogger(__name__)
 
@@ -158,7 +158,7 @@ def train_motion_model(start_hours : int = 24 * 7, interval_hours: int = 24 * 7,
         by default 1800 seconds (30 minutes).
     """
     base_logger.info(f"Fetching sensor data starting {start_hours} hours ago for a duration of {interval_hours} hours.")
-    sensor_data = fetch_all_sensor_data(start_hours, interval_hours)
+    sensor_data = fetch_all_sensor_frame(start_hours, interval_hours)
     base_logger.info("Preparing data for occupancy model.")
     df = prepare_data_for_occupancy_model(sensor_data)
     base_logger.info("Preprocessing data for motion analysis.")
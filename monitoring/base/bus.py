@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+from abc import ABC
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp
+
+from .deadline import DEADLINE_HEADER
+from .routing import call_app
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBus(ABC):
+    """
+    Process-wide bus delivering events to the functions deployed on the
+    same :class:`LocalGateway <gateway.LocalGateway>` that emitted them.
+
+    Instead of a round trip through SIF-edge, a function subscribed to a
+    single event is invoked right away through the application itself, so
+    the invocation still goes through its middleware, validation and
+    executor, with the deadline given by the function's timeout. Once the
+    local invocations finished, the event is mirrored to the scheduler
+    along with the functions which handled it successfully, so SIF-edge
+    records it and dispatches it to any other subscriber, but not to those
+    functions again. Failed functions are dispatched by SIF-edge as usual,
+    i.e., with its retries, dead letters and breakers. Functions subscribed
+    to several events are left to the scheduler, which joins their events.
+
+    Use :func:`get_bus` instead of instantiating it.
+    """
+
+    def __init__(self):
+        super(LocalBus, self).__init__()
+        self.lock = Lock()
+        # Event name -> function name -> path and method of its route, and its timeout in seconds
+        self.subscribers: Dict[str, Dict[str, Tuple[str, str, Optional[float]]]] = {}
+        self.app: Optional[ASGIApp] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"published": 0, "invoked": 0, "failed": 0}
+
+    def subscribe(self, evt: str, name: str, path: str, method: str, timeout: float = None):
+        with self.lock:
+            self.subscribers.setdefault(evt, {})[name] = (path, method.upper(), timeout)
+
+    def unsubscribe(self, name: str):
+        with self.lock:
+            for subs in self.subscribers.values():
+                subs.pop(name, None)
+
+    def attach(self, app: ASGIApp, loop: asyncio.AbstractEventLoop):
+        """
+        Starts invoking the subscribed functions through `app` on `loop`
+        """
+        with self.lock:
+            self.app, self.loop = app, loop
+
+    def detach(self):
+        with self.lock:
+            self.app, self.loop = None, None
+
+    def __prepare(self, name: str, data: Any) -> Tuple[Optional[ASGIApp], Optional[asyncio.AbstractEventLoop],
+                                                        List[Tuple[str, str, str, Optional[float]]], bytes]:
+        with self.lock:
+            subs = [(fn, *sub) for fn, sub in self.subscribers.get(name, {}).items()]
+            app, loop = self.app, self.loop
+        if app is None or loop is None or loop.is_closed() or len(subs) == 0:
+            return None, None, [], b""
+
+        # Same body as SIF-edge's invocations
+        evt = {"timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")}
+        if data:
+            evt["data"] = data
+        self._count("published")
+        return app, loop, subs, json.dumps({name: evt}).encode()
+
+    def publish(self, name: str, data: Any, then: Callable[[List[str]], Any]):
+        """
+        Hands the invocations of the local subscribers of an event to the
+        application's event loop and returns right away, so it can be called
+        from any thread, including the loop's and the timer's
+
+        :param then: Called with the functions which handled the event successfully once all of them finished, e.g.,
+            to send the event to the scheduler. Right away if there is no local subscriber
+        """
+        app, loop, subs, body = self.__prepare(name, data)
+        if len(subs) == 0:
+            self.__then(then, [])
+            return
+
+        async def invoke_all():
+            handled = []
+            try:
+                results = await asyncio.gather(*[self.__invoke(app, *sub, body) for sub in subs])
+                handled = [sub[0] for sub, ok in zip(subs, results) if ok]
+            finally:
+                # Even if cancelled upon shutdown, so the scheduler still gets the event
+                self.__then(then, handled)
+
+        asyncio.run_coroutine_threadsafe(invoke_all(), loop)
+
+    @staticmethod
+    def __then(then: Callable[[List[str]], Any], handled: List[str]):
+        try:
+            then(handled)
+        except Exception as err:
+            logger.error(f"Failure after the local invocations: {err}", exc_info=True)
+
+    async def publish_async(self, name: str, data: Any = None) -> List[str]:
+        """
+        Asynchronous variant of :meth:`publish`, which waits for the local
+        subscribers without blocking the event loop it is awaited on
+
+        :returns: the functions which handled the event successfully
+        """
+        app, loop, subs, body = self.__prepare(name, data)
+        if len(subs) == 0:
+            return []
+        if asyncio.get_running_loop() is loop:
+            invocations = [self.__invoke(app, *sub, body) for sub in subs]
+        else:
+            invocations = [asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.__invoke(app, *sub, body), loop))
+                           for sub in subs]
+        results = await asyncio.gather(*invocations)
+        return [sub[0] for sub, ok in zip(subs, results) if ok]
+
+    async def __invoke(self, app: ASGIApp, fn: str, path: str, method: str, timeout: Optional[float],
+                       body: bytes) -> bool:
+        headers = [(b"content-type", b"application/json")]
+        if timeout is not None:
+            headers.append((DEADLINE_HEADER.lower().encode(), str(time.time() + timeout).encode()))
+        try:
+            status = await call_app(app, method, path, headers, body)
+        except Exception as err:
+            logger.error(f"Local invocation of {fn} failed, leaving it to the scheduler: {err}", exc_info=True)
+            self._count("failed")
+            return False
+        if status is not None and status < 300:
+            self._count("invoked")
+            return True
+        self._count("failed")
+        logger.error(f"Local invocation of {fn} failed with status {status}, leaving it to the scheduler")
+        return False
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def metrics(self) -> Dict[str, int]:
+        with self.lock:
+            return {**self.stats, "subscriptions": sum(len(subs) for subs in self.subscribers.values())}
+
+
+_bus = LocalBus()
+
+
+def _reset_bus():
+    global _bus
+    _bus = LocalBus()
+
+
+# Worker processes of the handlers cannot reach the event loop of the parent
+os.register_at_fork(after_in_child=_reset_bus)
+
+
+def get_bus() -> LocalBus:
+    """
+    Returns the process-wide bus
+    """
+    return _bus
@@ -27,6 +27,25 @@ CHECK_BURGLARY_WAIT_TIME = "40s"  # Wait 40 seconds before starting the first ch
 CHECK_EMERGENCY_INTERVAL = "30m"  # Emergency events will be checked every 30 minutes
 CHECK_EMERGENCY_WAIT_TIME = "50s"  # Wait 50 seconds before starting the first check
 
+# What the triggers do about the runs missed while the service was down, the
+# schedule is resumed from the last run when TRIGGER_STATE_PATH is set
+TRAINING_CATCH_UP = "skip"  # Retraining waits for its next slot instead of piling up after restarts
+CHECK_CATCH_UP = "once"  # Checks and analyses run once to cover the missed period
+
+# Retraining follows these cron expressions instead of the intervals above. The
+# jobs are an hour apart within the night window, so they never overlap while
+# the home is quiet. Set a cron expression to None to go back to its interval
+TRAIN_OCCUPANCY_MODEL_CRON = "0 2 * * *"  # Every night at 02:00
+TRAIN_MOTION_MODEL_CRON = "0 3 * * *"  # Every night at 03:00
+TRAIN_BURGLARY_MODEL_CRON = "0 4 * * *"  # Every night at 04:00
+TRAINING_WINDOW = "02:00-05:00"  # Retraining never starts outside of this window
+TRAINING_JITTER = "15m"  # Random delay of each retraining, shorter than the gap between the jobs
+
+# How long the scheduler waits for each check before aborting it
+CHECK_EMERGENCY_TIMEOUT = "25m"  # Shorter than the interval so checks never overlap
+CHECK_BURGLARY_TIMEOUT = "50m"  # Shorter than the interval so checks never overlap
+ANALYSE_MOTION_TIMEOUT = "1h"
+
 # Threshold for emergency detection
 TRESHOLD_FOR_EMERGENCY_DETECTION = 3  # Number of standard deviations from the mean to trigger an emergency
 
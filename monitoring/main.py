@@ -1,6 +1,6 @@
 import logging
 from fastapi import Request
-from base import PeriodicTrigger, OneShotTrigger
+from base import AsyncPeriodicTrigger, AsyncCronTrigger, AsyncOneShotTrigger, DeadlineExceeded
 from base.gateway import LocalGateway
 from patient_emergency_detection import emergency_detection_workflow
 from burglary_detection import detect_burglary
@@ -29,7 +29,17 @@ from config import (
     TRAIN_BURGLARY_MODEL_INTERVAL,
     TRAIN_BURGLARY_MODEL_WAIT_TIME,
     CHECK_BURGLARY_INTERVAL,
-    CHECK_BURGLARY_WAIT_TIME
+    CHECK_BURGLARY_WAIT_TIME,
+    TRAINING_CATCH_UP,
+    CHECK_CATCH_UP,
+    TRAIN_OCCUPANCY_MODEL_CRON,
+    TRAIN_MOTION_MODEL_CRON,
+    TRAIN_BURGLARY_MODEL_CRON,
+    TRAINING_WINDOW,
+    TRAINING_JITTER,
+    CHECK_EMERGENCY_TIMEOUT,
+    CHECK_BURGLARY_TIMEOUT,
+    ANALYSE_MOTION_TIMEOUT
 )
 
 # Configure logging
@@ -55,12 +65,14 @@ async def check_emergency_detection_function(request: Request):
         emergency_detected, message = emergency_detection_workflow(threshold=TRESHOLD_FOR_EMERGENCY_DETECTION)
         if emergency_detected:
             logger.info(f"Emergency detected: {message}")
-            trigger = OneShotTrigger(EmergencyEvent(message))
+            app.add_trigger(AsyncOneShotTrigger(EmergencyEvent(message)))
         else:
             logger.info("No emergency detected.")
 
         return {"status": "success"}
 
+    except DeadlineExceeded:
+        raise
     except ValueError as ve:
         logger.error(f"ValueError in check_emergency_detection_function: {ve}", exc_info=True)
         return {"status": "error", "message": str(ve)}
@@ -88,11 +100,13 @@ async def check_burglary_detection_function(request: Request):
 
         if burglary_detected:
             logger.info(f"Burglary detected: {message}")
-            trigger = OneShotTrigger(BurglaryEvent(message))
+            app.add_trigger(AsyncOneShotTrigger(BurglaryEvent(message)))
         else:
             logger.info("No burglary detected.")
 
         return {"status": "success"}
+    except DeadlineExceeded:
+        raise
     except ValueError as ve:
         logger.error(f"ValueError in check_burglary_detection_function: {ve}", exc_info=True)
         return {"status": "error", "message": str(ve)}
@@ -125,70 +139,77 @@ events_and_triggers = [
         "trigger_name": "Periodic trigger for TrainOccupancyModelEvent",
         "interval": TRAIN_OCCUPANCY_MODEL_INTERVAL,
         "wait_time": TRAIN_OCCUPANCY_MODEL_WAIT_TIME,
+        "catch_up": TRAINING_CATCH_UP,
+        "cron": TRAIN_OCCUPANCY_MODEL_CRON,
+        "window": TRAINING_WINDOW,
+        "jitter": TRAINING_JITTER,
     },
     {
         "event_class": CheckEmergencyEvent,
         "trigger_name": "Periodic trigger for CheckEmergencyEvent",
         "interval": CHECK_EMERGENCY_INTERVAL,
         "wait_time": CHECK_EMERGENCY_WAIT_TIME,
+        "catch_up": CHECK_CATCH_UP,
     },
     {
         "event_class": TrainMotionModelEvent,
         "trigger_name": "Periodic trigger for TrainMotionModelEvent",
         "interval": TRAIN_MOTION_MODEL_INTERVAL,
         "wait_time": TRAIN_MOTION_MODEL_WAIT_TIME,
+        "catch_up": TRAINING_CATCH_UP,
+        "cron": TRAIN_MOTION_MODEL_CRON,
+        "window": TRAINING_WINDOW,
+        "jitter": TRAINING_JITTER,
     },
     {
         "event_class": AnalyzeMotionEvent,
         "trigger_name": "Periodic trigger for AnalyzeMotionEvent",
         "interval": ANALYSE_MOTION_INTERVAL,
         "wait_time": ANALYSE_MOTION_WAIT_TIME,
+        "catch_up": CHECK_CATCH_UP,
     },
     {
         "event_class": TrainBurglaryModelEvent,
         "trigger_name": "Periodic trigger for TrainBurglaryModelEvent",
         "interval": TRAIN_BURGLARY_MODEL_INTERVAL,
         "wait_time": TRAIN_BURGLARY_MODEL_WAIT_TIME,
+        "catch_up": TRAINING_CATCH_UP,
+        "cron": TRAIN_BURGLARY_MODEL_CRON,
+        "window": TRAINING_WINDOW,
+        "jitter": TRAINING_JITTER,
     },
     {
         "event_class": CheckBurglaryEvent,
         "trigger_name": "Periodic trigger for CheckBurglaryEvent",
         "interval": CHECK_BURGLARY_INTERVAL,
         "wait_time": CHECK_BURGLARY_WAIT_TIME,
+        "catch_up": CHECK_CATCH_UP,
     },
 ]
 
-# Instantiate events and create periodic triggers
-triggers = []
-for trigger_config in events_and_triggers:
-    event_instance = trigger_config["event_class"]()
-    trigger = PeriodicTrigger(
-        event_instance,
-        duration=trigger_config["interval"],
-        wait_time=trigger_config["wait_time"]
-    )
-    triggers.append(trigger)
-    logger.info(f"{trigger_config['trigger_name']} configured.")
-
 # List of functions to deploy
 functions_to_deploy = [
     {
         "func": check_emergency_detection_function,
         "name": "check_emergency_detection_function",
         "evts": "CheckEmergencyEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": CHECK_EMERGENCY_TIMEOUT
     },
     {
         "func": check_burglary_detection_function,
         "name": "check_burglary_detection_function",
         "evts": "CheckBurglaryEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": CHECK_BURGLARY_TIMEOUT
     },
     {
         "func": motion_analysis_function,
         "name": "motion_analysis_function",
         "evts": "AnalyzeMotionEvent",
-        "method": "POST"
+        "method": "POST",
+        "timeout": ANALYSE_MOTION_TIMEOUT,
+        "job": True
     }
 ]
 
@@ -196,12 +217,42 @@ functions_to_deploy = [
 app = LocalGateway()
 logger.info("Gateway initialized.")
 
+# Instantiate events and create periodic triggers, which start along with the gateway
+triggers = []
+for trigger_config in events_and_triggers:
+    event_instance = trigger_config["event_class"]()
+    if trigger_config.get("cron") is not None:
+        trigger = app.add_trigger(AsyncCronTrigger(
+            event_instance,
+            cron=trigger_config["cron"],
+            name=trigger_config["event_class"].__name__,
+            catch_up=trigger_config["catch_up"],
+            jitter=trigger_config["jitter"],
+            window=trigger_config["window"]
+        ))
+    else:
+        trigger = app.add_trigger(AsyncPeriodicTrigger(
+            event_instance,
+            duration=trigger_config["interval"],
+            wait_time=trigger_config["wait_time"],
+            name=trigger_config["event_class"].__name__,
+            catch_up=trigger_config["catch_up"]
+        ))
+    triggers.append(trigger)
+    logger.info(f"{trigger_config['trigger_name']} configured.")
+
 # Deploy all functions
 for func_config in functions_to_deploy:
     app.deploy(
         func_config["func"],
         name=func_config["name"],
         evts=func_config["evts"],
-        method=func_config["method"]
+        method=func_config["method"],
+        timeout=func_config["timeout"],
+        job=func_config.get("job", False),
+        defer=True
     )
-    logger.info(f"{func_config['name']} deployed.")
\ No newline at end of file
+    logger.info(f"{func_config['name']} deployed.")
+
+# Register all functions with the scheduler in one request
+app.register()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import logging
+from typing import List, Union
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 
@@ -21,25 +22,30 @@ def map_sensor_to_room(sensor_name: str) -> str:
     return sensor_mapping.get(sensor_name, 'unknown_room')
 
 
-def prepare_data_for_occupancy_model(sensor_data: list) -> pd.DataFrame:
+def prepare_data_for_occupancy_model(sensor_data: Union[List[dict], pd.DataFrame]) -> pd.DataFrame:
     """
     Prepare sensor data for model training.
 
-    :param sensor_data: A list of dictionaries containing sensor readings.
+    :param sensor_data: A list of dictionaries containing sensor readings, or a DataFrame from `fetch_sources_frame`,
+        whose sensor names and timestamps are already converted.
     :return: A pandas DataFrame with time-sorted and label-encoded sensor data.
     """
-    df = pd.DataFrame(sensor_data)
-    base_logger.info(f"Original data shape: {df.shape}")
-
-    # Handle 'sensor' as a list
-    if 'sensor' in df.columns:
-        df['sensor'] = df['sensor'].apply(
-            lambda x: x[0] if isinstance(x, list) and len(x) > 0 else 'unknown_sensor'
-        )
-
-    # Convert timestamp from milliseconds to datetime
-    if 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    if isinstance(sensor_data, pd.DataFrame):
+        df = sensor_data.copy()
+        base_logger.info(f"Original data shape: {df.shape}")
+    else:
+        df = pd.DataFrame(sensor_data)
+        base_logger.info(f"Original data shape: {df.shape}")
+
+        # Handle 'sensor' as a list
+        if 'sensor' in df.columns:
+            df['sensor'] = df['sensor'].apply(
+                lambda x: x[0] if isinstance(x, list) and len(x) > 0 else 'unknown_sensor'
+            )
+
+        # Convert timestamp from milliseconds to datetime
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
 
     # Sort by timestamp
     df = df.sort_values('timestamp')
@@ -67,15 +73,16 @@ def calculate_times_in_each_room(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
 
-    # 1) Map each sensor to a room or event label
-    df['room'] = df['sensor'].apply(map_sensor_to_room)
+    # 1) Map each sensor to a room or event label, once per category if 'sensor' is categorical,
+    # kept as strings so the room statistics match those computed from the records
+    df['room'] = df['sensor'].map(map_sensor_to_room).astype(str)
 
     # 2) Identify room-change points
     df['room_change'] = (df['room'] != df['room'].shift(1)).astype(int)
     df['group_id'] = df['room_change'].cumsum()
 
     # 3) Calculate start/end times for each group
-    duration_df = df.groupby(['group_id', 'room'], as_index=False).agg(
+    duration_df = df.groupby(['group_id', 'room'], as_index=False, observed=True).agg(
         start_time=('timestamp', 'min'),
         end_time=('timestamp', 'max')
     )
@@ -101,7 +108,7 @@ def train_occupancy_model(sensor_data_df: pd.DataFrame) -> pd.DataFrame:
     duration_df = calculate_times_in_each_room(sensor_data_df)
 
     # 2) Group by 'room' to get mean & std
-    room_stats = duration_df.groupby('room')['duration_seconds'].agg(['mean', 'std']).reset_index()
+    room_stats = duration_df.groupby('room', observed=True)['duration_seconds'].agg(['mean', 'std']).reset_index()
 
     # 3) Fill NaNs for std
     room_stats['std'] = room_stats['std'].fillna(0)
@@ -1,10 +1,11 @@
 import logging
-from typing import List, Tuple
+from typing import List, Tuple, Union
 from datetime import timedelta
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
-from base.influx_utils import fetch_all_sensor_data
+from base.influx_utils import fetch_all_sensor_frame
 from base.minio_utils import load_model_from_minio
+from base.deadline import check_deadline
 
 # ------------------------------
 # Constants
@@ -44,7 +45,7 @@ def map_sensor_to_room(sensor_name: str) -> str:
     return sensor_mapping.get(sensor_name, UNKNOWN_ROOM)
 
 
-def prepare_data_for_occupancy_model(sensor_data: List[dict]) -> pd.DataFrame:
+def prepare_data_for_occupancy_model(sensor_data: Union[List[dict], pd.DataFrame]) -> pd.DataFrame:
     """
     Prepare sensor data for occupancy model training.
 
@@ -55,27 +56,34 @@ def prepare_data_for_occupancy_model(sensor_data: List[dict]) -> pd.DataFrame:
       - Sorting the DataFrame by timestamp.
       - Encoding the 'sensor' column.
 
-    :param sensor_data: A list of dictionaries containing sensor readings.
+    A DataFrame from `fetch_sources_frame` already holds sensor names and
+    datetimes, so only the last two steps apply to it.
+
+    :param sensor_data: A list of dictionaries containing sensor readings, or a DataFrame of them.
     :return: A pandas DataFrame with time-sorted and label-encoded sensor data.
     """
-    df = pd.DataFrame(sensor_data)
-    base_logger.info(f"Original data shape: {df.shape}")
-
-    # Handle 'sensor' as a list
-    if 'sensor' in df.columns:
-        df['sensor'] = df['sensor'].apply(
-            lambda x: x[0] if isinstance(x, list) and len(x) > 0 else UNKNOWN_ROOM
-        )
-        base_logger.info("Handled 'sensor' as a list.")
+    if isinstance(sensor_data, pd.DataFrame):
+        df = sensor_data.copy()
+        base_logger.info(f"Original data shape: {df.shape}")
     else:
-        base_logger.warning("'sensor' column not found in sensor data.")
+        df = pd.DataFrame(sensor_data)
+        base_logger.info(f"Original data shape: {df.shape}")
 
-    # Convert timestamp from milliseconds to datetime
-    if 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        base_logger.info("Timestamps converted to datetime.")
-    else:
-        base_logger.warning("'timestamp' column not found in sensor data.")
+        # Handle 'sensor' as a list
+        if 'sensor' in df.columns:
+            df['sensor'] = df['sensor'].apply(
+                lambda x: x[0] if isinstance(x, list) and len(x) > 0 else UNKNOWN_ROOM
+            )
+            base_logger.info("Handled 'sensor' as a list.")
+        else:
+            base_logger.warning("'sensor' column not found in sensor data.")
+
+        # Convert timestamp from milliseconds to datetime
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            base_logger.info("Timestamps converted to datetime.")
+        else:
+            base_logger.warning("'timestamp' column not found in sensor data.")
 
     # Sort by timestamp
     df = df.sort_values('timestamp').reset_index(drop=True)
@@ -111,8 +119,9 @@ def calculate_times_in_each_room(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
 
-    # Map each sensor to a room/event label
-    df['room'] = df['sensor'].apply(map_sensor_to_room)
+    # Map each sensor to a room/event label, once per category if 'sensor' is categorical,
+    # kept as strings so the room statistics match those computed from the records
+    df['room'] = df['sensor'].map(map_sensor_to_room).astype(str)
     base_logger.info("Mapped sensors to rooms.")
 
     # Identify room-change points
@@ -121,7 +130,7 @@ def calculate_times_in_each_room(df: pd.DataFrame) -> pd.DataFrame:
     base_logger.info("Identified room-change points and assigned group IDs.")
 
     # Calculate start/end times for each group
-    duration_df = df.groupby(['group_id', 'room'], as_index=False).agg(
+    duration_df = df.groupby(['group_id', 'room'], as_index=False, observed=True).agg(
         start_time=('timestamp', 'min'),
         end_time=('timestamp', 'max')
     )
@@ -142,7 +151,7 @@ def calculate_times_in_each_room(df: pd.DataFrame) -> pd.DataFrame:
     return duration_df
 
 
-def prepare_data_for_detection(sensor_data: List[dict]) -> pd.DataFrame:
+def prepare_data_for_detection(sensor_data: Union[List[dict], pd.DataFrame]) -> pd.DataFrame:
     """
     Full preparation pipeline for emergency detection.
 
@@ -150,7 +159,7 @@ def prepare_data_for_detection(sensor_data: List[dict]) -> pd.DataFrame:
       1. Preparing sensor data for occupancy modeling (sorting, encoding).
       2. Calculating durations of time spent in each room.
 
-    :param sensor_data: A list of raw sensor data dictionaries.
+    :param sensor_data: A list of raw sensor data dictionaries, or a DataFrame of them.
     :return: A DataFrame with columns: ['room', 'start_time', 'end_time', 'duration', 'duration_seconds'].
     """
     base_logger.info("Starting data preparation for detection.")
@@ -170,11 +179,11 @@ def format_duration(seconds: float) -> str:
     return str(timedelta(seconds=int(round(seconds))))
 
 
-def retrieve_patient_location(sensor_data: List[dict]) -> Tuple[str, float]:
+def retrieve_patient_location(sensor_data: Union[List[dict], pd.DataFrame]) -> Tuple[str, float]:
     """
     Retrieve the current room and the duration spent in that room by the patient.
 
-    :param sensor_data: A list of raw sensor data dictionaries.
+    :param sensor_data: A list of raw sensor data dictionaries, or a DataFrame of them.
     :return: A tuple containing the current room and duration in seconds.
     """
     base_logger.info("Retrieving patient location and duration.")
@@ -295,16 +304,17 @@ def emergency_detection_workflow(threshold: int = THRESHOLD_FOR_EMERGENCY_DETECT
     base_logger.info("Initiating emergency detection workflow.")
 
     # Retrieve sensor data
-    sensor_data = fetch_all_sensor_data(
+    sensor_data = fetch_all_sensor_frame(
         start_hours=24,
         interval_hours=24
     )
-    if not sensor_data:
-        warning_message = "No sensor data retrieved from 'fetch_all_sensor_data'."
+    if sensor_data.empty:
+        warning_message = "No sensor data retrieved from 'fetch_all_sensor_frame'."
         base_logger.warning(warning_message)
         return False, warning_message
 
     base_logger.info(f"Fetched {len(sensor_data)} sensor data records.")
+    check_deadline("retrieving the patient location")
 
     # Retrieve patient location and duration
     room, duration = retrieve_patient_location(sensor_data)
@@ -314,6 +324,7 @@ def emergency_detection_workflow(threshold: int = THRESHOLD_FOR_EMERGENCY_DETECT
         return False, warning_message
 
     # Retrieve room statistics
+    check_deadline("retrieving the room statistics")
     room_stats_df = retrieve_room_stats("occupancy")
     if room_stats_df is None or room_stats_df.empty:
         error_message = "Room statistics not available for emergency detection."
@@ -1,6 +1,26 @@
 from .event import BaseEventFabric, ExampleEventFabric
 from .gateway import LocalGateway, logger as base_logger
-from .trigger import Trigger, OneShotTrigger, PeriodicTrigger
+from .trigger import Trigger, OneShotTrigger, PeriodicTrigger, CronTrigger, AsyncTrigger, AsyncOneShotTrigger, \
+    AsyncPeriodicTrigger, AsyncCronTrigger, CatchUp
+from .schedule import CronExpression, TimeWindow
+from .checkpoint import TriggerCheckpoint
+from .timer import TimerService, get_timer_service
+from .emitter import EventEmitter, get_emitter, flush_emitters
+from .spool import EventSpool
+from .offload import HandlerPools, Offload
+from .jobs import JobQueue, JobStatus
+from .bus import LocalBus, get_bus
+from .channel import ServiceChannel
+from .leader import LeaderElector, LeaseBackend, FileLease, SchedulerLease
+from .deadline import DeadlineExceeded, check_deadline, remaining_time
 
 __all__ = ["BaseEventFabric", "LocalGateway", "base_logger",
-           "ExampleEventFabric", "Trigger", "OneShotTrigger", "PeriodicTrigger"]
+           "ExampleEventFabric", "Trigger", "OneShotTrigger", "PeriodicTrigger", "CronTrigger",
+           "AsyncTrigger", "AsyncOneShotTrigger", "AsyncPeriodicTrigger", "AsyncCronTrigger", "CatchUp", "TriggerCheckpoint",
+           "CronExpression", "TimeWindow",
+           "TimerService", "get_timer_service",
+           "DeadlineExceeded", "check_deadline", "remaining_time",
+           "EventEmitter", "get_emitter", "flush_emitters", "EventSpool",
+           "HandlerPools", "Offload", "JobQueue", "JobStatus",
+           "LocalBus", "get_bus", "ServiceChannel",
+           "LeaderElector", "LeaseBackend", "FileLease", "SchedulerLease"]
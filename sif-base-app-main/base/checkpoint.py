@@ -0,0 +1,77 @@
+import os
+import json
+import logging
+
+from abc import ABC
+from threading import Lock
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerCheckpoint(ABC):
+    """
+    Persists the last time each named trigger fired, so its schedule resumes
+    from there after a restart instead of starting over.
+
+    The times are wall-clock UNIX timestamps stored as a JSON object, which
+    is rewritten atomically on every update.
+
+    :param path: File holding the checkpoint, its directory is created if missing
+    """
+
+    def __init__(self, path: str):
+        super(TriggerCheckpoint, self).__init__()
+        self.path = path
+        self.lock = Lock()
+        self.last_fired: Dict[str, float] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.isfile(path):
+            try:
+                with open(path) as fd:
+                    self.last_fired = {k: float(v) for k, v in json.load(fd).items()}
+                logger.info(f"Restored {len(self.last_fired)} trigger checkpoints from {path}")
+            except (ValueError, AttributeError) as err:
+                logger.error(f"Ignoring corrupted trigger checkpoint {path}: {err}")
+
+    def get(self, name: str) -> Optional[float]:
+        """
+        :returns: the last time the trigger `name` fired, `None` if it never did
+        """
+        with self.lock:
+            return self.last_fired.get(name)
+
+    def record(self, name: str, fired_at: float):
+        """
+        Stores the time the trigger `name` fired
+        """
+        with self.lock:
+            self.last_fired[name] = fired_at
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, "w") as fd:
+                    json.dump(self.last_fired, fd)
+                os.replace(tmp, self.path)
+            except OSError as err:
+                logger.error(f"Failure writing the trigger checkpoint {self.path}: {err}")
+
+
+_checkpoint: Optional[TriggerCheckpoint] = None
+_checkpoint_lock = Lock()
+
+
+def get_checkpoint() -> Optional[TriggerCheckpoint]:
+    """
+    Returns the process-wide checkpoint stored at the `TRIGGER_STATE_PATH`
+    environment variable, `None` if it is not set
+    """
+    global _checkpoint
+    path = os.environ.get("TRIGGER_STATE_PATH", None)
+    if path is None:
+        return None
+    with _checkpoint_lock:
+        if _checkpoint is None or _checkpoint.path != path:
+            _checkpoint = TriggerCheckpoint(path)
+        return _checkpoint
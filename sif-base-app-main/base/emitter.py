@@ -0,0 +1,338 @@
+import os
+import time
+import queue
+import atexit
+import asyncio
+import logging
+import urllib3
+
+from abc import ABC
+from threading import Thread, Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from .spool import EventSpool
+
+if TYPE_CHECKING:
+    from .channel import ServiceChannel
+
+logger = logging.getLogger(__name__)
+
+# Called with the event's name, whether it was delivered and the failure reason
+DeliveryCallback = Callable[[str, bool, Optional[str]], None]
+# Queued event: its name, data, delivery callback and the functions which already handled it
+QueuedEvent = Tuple[str, Any, Optional[DeliveryCallback], Optional[List[str]]]
+
+
+def event_payload(name: str, data: Any = None, handled: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    :returns: the EventRequest accepted by the scheduler
+    """
+    payload = dict(name=name, data=data)
+    if handled:
+        # SIF-edge does not dispatch the event to these functions again
+        payload["handled"] = handled
+    return payload
+
+
+class EventEmitter(ABC):
+    """
+    Process-wide emitter sending EventRequests to the SIF-edge scheduler.
+
+    Events are queued and sent by a single background thread over a shared
+    keep-alive connection pool, so emitting an event neither opens a new
+    connection nor blocks the caller while the scheduler answers. Events
+    are sent in the order they were emitted.
+
+    With `batch_size` above 1, the emitter buffers events and sends them in
+    one request to the scheduler's `/api/events` once `batch_size` events
+    are waiting or `linger` seconds passed since the first of them. If the
+    scheduler lacks the batch endpoint, the events are sent one by one.
+
+    If `spool_dir` is given, events the scheduler could not take because it
+    is unreachable or failing are stored in an :class:`EventSpool
+    <spool.EventSpool>` and replayed by a second thread at `spool_rate`
+    events per second once the scheduler answers again. Replayed events are
+    therefore delivered after the events emitted in the meantime.
+
+    Use :func:`get_emitter` instead of instantiating it, so the whole
+    process shares one emitter per scheduler.
+
+    :param scheduler: URL of the SIF-edge scheduler
+    :param max_queue: Number of events waiting to be sent before new ones are dropped
+    :param batch_size: Maximum number of events sent in one request
+    :param linger: Seconds to wait for further events before sending a batch
+    :param spool_dir: Directory of the spool for undeliverable events, disabled if not given
+    :param spool_rate: Events per second replayed from the spool
+    """
+
+    UNSUPPORTED = "batch endpoint not available"
+
+    def __init__(self, scheduler: str, max_queue: int = None, batch_size: int = None, linger: float = None,
+                 spool_dir: str = None, spool_rate: float = None):
+        super(EventEmitter, self).__init__()
+        self.scheduler = scheduler
+        self.batch_size: int = batch_size or int(
+            os.environ.get("EVENT_BATCH_SIZE", "1"))
+        self.linger: float = linger if linger is not None else float(
+            os.environ.get("EVENT_LINGER", "0.05"))
+        self.batching = self.batch_size > 1
+        self.http = urllib3.PoolManager(maxsize=2)
+        # Set by the LocalGateway if the replica keeps a channel open to the scheduler
+        self.channel: Optional["ServiceChannel"] = None
+        self.queue: queue.Queue = queue.Queue(max_queue or int(
+            os.environ.get("EVENT_QUEUE_SIZE", "1000")))
+        self.callbacks = []
+        self.stats_lock = Lock()
+        self.stats = {"emitted": 0, "delivered": 0, "failed": 0,
+                      "dropped": 0, "batches": 0, "spooled": 0}
+        spool_dir = spool_dir or os.environ.get("EVENT_SPOOL_DIR", None)
+        self.spool: Optional[EventSpool] = EventSpool(spool_dir) if spool_dir else None
+        self.spool_rate: float = spool_rate or float(
+            os.environ.get("EVENT_SPOOL_RATE", "5"))
+        self.thr = Thread(target=self.run, daemon=True)
+        self.thr.start()
+        if self.spool is not None:
+            self.drain_thr = Thread(target=self.drain, daemon=True)
+            self.drain_thr.start()
+
+    def add_callback(self, cb: DeliveryCallback):
+        """
+        Registers a callback reporting the delivery result of every event
+        """
+        self.callbacks.append(cb)
+
+    def emit(self, name: str, data: Any = None, callback: DeliveryCallback = None,
+             handled: Optional[List[str]] = None) -> bool:
+        """
+        Queues an event for delivery and returns right away
+
+        :param name: Event name
+        :param data: Event data, it must be JSON serializable
+        :param callback: Reports the delivery result of this event
+        :param handled: Functions which already handled the event in this process, see :class:`LocalBus <bus.LocalBus>`
+        :returns: whether the event was queued
+        """
+        try:
+            self.queue.put_nowait((name, data, callback, handled))
+        except queue.Full:
+            self._count("dropped")
+            logger.error(f"Event queue is full, dropping {name}")
+            self._report(name, False, "event queue is full", callback)
+            return False
+        self._count("emitted")
+        return True
+
+    async def emit_async(self, name: str, data: Any = None, callback: DeliveryCallback = None,
+                         handled: Optional[List[str]] = None) -> bool:
+        """
+        Queues an event and waits for its delivery without blocking the
+        event loop, so it can be awaited from FastAPI handlers
+
+        :returns: whether the scheduler accepted the event
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def resolve(_name: str, ok: bool, reason: Optional[str]):
+            loop.call_soon_threadsafe(
+                lambda: fut.done() or fut.set_result(ok))
+            if callback is not None:
+                callback(_name, ok, reason)
+
+        if not self.emit(name, data, resolve, handled):
+            return False
+        return await fut
+
+    def _post(self, path: str, payload: Any, retries: Any = None) -> Tuple[Optional[int], Optional[str]]:
+        """
+        :returns: the status of the response, `None` if the scheduler was not reached, and the failure reason
+        """
+        try:
+            res = self.http.request('POST', f"{self.scheduler}{path}", json=payload,
+                                    retries=urllib3.Retry(5) if retries is None else retries)
+            if res.status >= 300:
+                return res.status, res.reason
+            return res.status, None
+        except Exception as err:
+            return None, str(err)
+
+    def send(self, name: str, data: Any = None) -> Optional[str]:
+        """
+        Sends an event synchronously
+
+        :returns: the failure reason, `None` once delivered
+        """
+        return self._post("/api/event", event_payload(name, data))[1]
+
+    def send_batch(self, events: List[Tuple[str, Any, Optional[List[str]]]]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Sends several events in one request, preserving their order
+
+        :returns: the status of the response and the failure reason, `None` once delivered
+        """
+        status, reason = self._post(
+            "/api/events", dict(events=[event_payload(*evt) for evt in events]))
+        if status in (404, 405):
+            logger.warning(
+                "The scheduler does not accept batches, sending events one by one")
+            self.batching = False
+            return status, self.UNSUPPORTED
+        return status, reason
+
+    def next_batch(self) -> List[QueuedEvent]:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.linger
+        while self.batching and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def deliver(self, batch: List[QueuedEvent]):
+        if self.channel is not None:
+            results = self.channel.send_events([event_payload(name, data, handled)
+                                                for name, data, _, handled in batch])
+            if results is not None:
+                remaining = []
+                for evt, (status, reason) in zip(batch, results):
+                    if status is None:
+                        # The channel dropped or ran out of credits, send it over HTTP
+                        remaining.append(evt)
+                    else:
+                        self._settle(evt[0], evt[1], status, reason, evt[2], evt[3])
+                if len(remaining) == 0:
+                    return
+                batch = remaining
+
+        if len(batch) > 1 and self.batching:
+            status, reason = self.send_batch([(name, data, handled) for name, data, _, handled in batch])
+            if reason is not self.UNSUPPORTED:
+                self._count("batches")
+                for name, data, callback, handled in batch:
+                    self._settle(name, data, status, reason, callback, handled)
+                return
+
+        for name, data, callback, handled in batch:
+            status, reason = self._post("/api/event", event_payload(name, data, handled))
+            self._settle(name, data, status, reason, callback, handled)
+
+    def _settle(self, name: str, data: Any, status: Optional[int], reason: Optional[str],
+                callback: DeliveryCallback, handled: Optional[List[str]] = None):
+        if reason is None:
+            self._count("delivered")
+        elif self.spool is not None and (status is None or status >= 500):
+            # The scheduler is unreachable or failing, keep the event for later
+            self.spool.append(name, data, handled)
+            self._count("spooled")
+            reason = f"{reason} (spooled)"
+        else:
+            self._count("failed")
+        self._report(name, reason is None, reason, callback)
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            try:
+                self.deliver(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def drain(self):
+        """
+        Replays spooled events once the scheduler is reachable, sending at
+        most `spool_rate` events per second and backing off exponentially
+        while the scheduler keeps failing
+        """
+        backoff = 1.0
+        while True:
+            if not self.spool.wait(timeout=60):
+                continue
+            for offset, name, data, handled in self.spool.peek(10):
+                status, reason = self._post(
+                    "/api/event", event_payload(name, data, handled), retries=False)
+                if reason is not None and (status is None or status >= 500):
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+                    break
+                if reason is not None:
+                    logger.error(f"Dropping spooled event {name} because {reason}")
+                    self._count("failed")
+                else:
+                    self._count("delivered")
+                self.spool.commit(offset)
+                backoff = 1.0
+                time.sleep(1 / self.spool_rate)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Blocks until every queued event has been sent
+
+        :param timeout: Seconds to wait at most
+        :returns: whether all events were sent in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _report(self, name: str, ok: bool, reason: Optional[str], callback: DeliveryCallback):
+        for cb in [*self.callbacks, callback]:
+            if cb is None:
+                continue
+            try:
+                cb(name, ok, reason)
+            except Exception as err:
+                logger.error(f"Failure in delivery callback for {name}: {err}")
+
+    def metrics(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return {**self.stats, "pending": self.queue.qsize(),
+                    "spool_depth": len(self.spool) if self.spool is not None else 0}
+
+
+_emitters: Dict[str, EventEmitter] = {}
+_emitters_lock = Lock()
+
+
+def get_emitter(scheduler: str = None) -> EventEmitter:
+    """
+    Returns the process-wide emitter for the given scheduler, which defaults
+    to the `SCH_SERVICE_NAME` environment variable
+    """
+    scheduler = scheduler or os.environ.get(
+        "SCH_SERVICE_NAME", "http://localhost:8080")
+    if not scheduler.startswith("http://"):
+        scheduler = f"http://{scheduler}"
+
+    with _emitters_lock:
+        if scheduler not in _emitters:
+            _emitters[scheduler] = EventEmitter(scheduler)
+        return _emitters[scheduler]
+
+
+def flush_emitters(timeout: float = 5) -> bool:
+    """
+    Flushes every emitter of the process, e.g., upon shutdown
+
+    :param timeout: Seconds to wait at most for each emitter
+    :returns: whether all events were sent in time
+    """
+    return all([emitter.flush(timeout=timeout) for emitter in list(_emitters.values())])
+
+
+atexit.register(flush_emitters)
+# Worker processes of the handlers must not share the sender threads of the parent
+os.register_at_fork(after_in_child=_emitters.clear)
@@ -1,9 +1,25 @@
 import os
 import socket
+import asyncio
 import urllib3
 import logging
-from typing import Callable, Any, List
-from fastapi import FastAPI
+import functools
+import durationpy
+from typing import Callable, Any, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse
+
+from .emitter import get_emitter, flush_emitters
+from .trigger import AsyncTrigger
+from .routing import DynamicRoutes
+from .offload import HandlerPools, Offload
+from .jobs import JobQueue
+from .bus import get_bus
+from .channel import ServiceChannel
+from .leader import LeaderElector, LeaseBackend, lease_from_env
+from .deadline import DEADLINE_HEADER, DeadlineExceeded, set_deadline, reset_deadline
 
 logger = logging.getLogger("fastapi_cli")
 
@@ -24,21 +40,106 @@ class LocalGateway(FastAPI):
     app.deploy(fn, 'My-Func', 'My-Event', 'POST')
     ```
 
+    Functions deployed once the application has started, e.g., from within a
+    request, are served by a single :class:`DynamicRoutes <routing.DynamicRoutes>`
+    route rather than added to the router, and the OpenAPI schema is only
+    generated again once it is requested.
+
+    Functions are registered with the scheduler by a background task once the
+    application has started, retrying with an exponential backoff while the
+    scheduler is unreachable, so the server never waits for SIF-edge to bind.
+    `/ready` answers with a 503 until every deployed function is registered,
+    while `/live` only reports that the server is running. Several functions
+    are registered in a single request by deploying them with `defer=True`
+    and calling :meth:`register` once.
+
+    Handlers run on a worker thread by default, so blocking calls within them,
+    e.g., to InfluxDB, do not stall the event loop. CPU-bound handlers should
+    be deployed with `executor="process"` instead, and handlers which never
+    block with `executor="loop"`. See :class:`HandlerPools <offload.HandlerPools>`.
+
+    Long-running functions should be deployed with `job=True`. Their
+    invocations are answered with `202 Accepted` and a job ID right away and
+    run in a :class:`JobQueue <jobs.JobQueue>`, whose jobs are reported at
+    `/api/jobs/{job_id}` and, optionally, with an event to the scheduler.
+
+    With `local_bus`, functions subscribed to a single event emitted by this
+    same process are invoked in-process through the :class:`LocalBus
+    <bus.LocalBus>`, while the event is still mirrored to the scheduler.
+
+    With `channel`, the replica keeps a :class:`ServiceChannel
+    <channel.ServiceChannel>` open to the scheduler, over which it sends its
+    events and receives its invocations. HTTP is used while it is down.
+
+    Invocations from SIF-edge may carry a deadline, which handlers can read
+    through :func:`deadline.remaining_time` or enforce with
+    :func:`deadline.check_deadline`.
+
+    :class:`AsyncTrigger <trigger.AsyncTrigger>` instances registered with
+    :meth:`add_trigger` run on the application's event loop. They start with
+    its lifespan and are cancelled upon shutdown, after which the queued
+    events are flushed. A `lifespan` given to the constructor still runs
+    within this one. With a `lease`, the periodic triggers only run on the
+    process elected leader by a :class:`LeaderElector
+    <leader.LeaderElector>`, so workers and replicas do not multiply them,
+    while one-shot triggers run wherever they are added.
+
     :param mock: Indicates if remote calls must be mocked
+    :param local_bus: Short-circuits events consumed by this process, defaults to the `LOCAL_BUS` environment variable
+    :param channel: Keeps a persistent channel to the scheduler, defaults to the `SIF_CHANNEL` environment variable
+    :param lease: :class:`LeaseBackend <leader.LeaseBackend>` electing the process running periodic triggers, defaults to `LEADER_ELECTION`
     """
 
-    def __init__(self, mock: bool = False, *args, **kwargs):
+    def __init__(self, mock: bool = False, *args, local_bus: bool = None, channel: bool = None,
+                 lease: LeaseBackend = None, **kwargs):
+        self.app_lifespan = kwargs.pop("lifespan", None)
+        kwargs["lifespan"] = self.__lifespan
         super(LocalGateway, self).__init__(*args, **kwargs)
+        self.triggers: List[AsyncTrigger] = []
+        self.loop: asyncio.AbstractEventLoop = None
         self.local_ip = None
         self.local_port = None
         self.mock = mock
+        self.deployed = {}
+        self.pending: List[Dict[str, Any]] = []
+        self.inflight: List[Dict[str, Any]] = []
+        self.rejected: List[Dict[str, Any]] = []
+        self.registering: asyncio.Event = None
+        self.registration_error: Optional[str] = None
+        self.max_backoff = float(os.environ.get("REGISTER_MAX_BACKOFF", "60"))
+        self.dynamic = DynamicRoutes()
+        self.pools = HandlerPools()
+        self.jobs = JobQueue(mock=mock)
+        if local_bus is None:
+            local_bus = os.environ.get("LOCAL_BUS", "false").lower() in ("1", "true", "yes")
+        self.bus = get_bus() if local_bus else None
+        if channel is None:
+            channel = os.environ.get("SIF_CHANNEL", "false").lower() in ("1", "true", "yes")
+        self.channel: Optional[ServiceChannel] = None
+        self.use_channel = channel and not mock
+        lease = lease or lease_from_env()
+        self.elector: Optional[LeaderElector] = None
+        if lease is not None:
+            self.elector = LeaderElector(lease, on_elected=self.__elected, on_demoted=self.__demoted)
+        self.executor = Offload(os.environ.get("HANDLER_EXECUTOR", Offload.THREAD.value))
+        self.router.routes.append(self.dynamic)
+        self.dynamic_schema = None
         self.scheduler = os.environ.get("SCH_SERVICE_NAME", "localhost:8080")
         if self.scheduler is None and not mock:
             raise ValueError(
                 "SCH_SERVICE_NAME should be given as an environment variable")
         self.__get_hostname()
+        self.add_api_route("/health", self.__health, methods=["GET"], include_in_schema=False)
+        self.add_api_route("/metrics", self.metrics, methods=["GET"], include_in_schema=False)
+        self.add_api_route("/ready", self.__ready, methods=["GET"], include_in_schema=False)
+        self.add_api_route("/live", self.__health, methods=["GET"], include_in_schema=False)
+        self.add_api_route("/api/jobs/{job_id}", self.__job_status, methods=["GET"])
+        self.middleware("http")(self.__track_deadline)
+        self.add_exception_handler(DeadlineExceeded, self.__deadline_exceeded)
 
-    def deploy(self, cb: Callable[..., Any], name: str, evts: List[str] | str,  method: str = "GET", path: str = None):
+    def deploy(self, cb: Callable[..., Any], name: str, evts: List[str] | str,  method: str = "GET", path: str = None,
+               timeout: str = None, defer: bool = False, executor: str = None, job: bool = False,
+               done_event: str = None):
         """
         Handles dynamically registration of endpoints within the server and
         scheduler
@@ -48,35 +149,356 @@ class LocalGateway(FastAPI):
         :param evts: EventRequests the function must subscribe
         :param method: Type of HTTP Method the SIF-edge's dispatcher must use to invoke the cb
         :param path: By default, `/api/cb.__name__` is used, this method overrides the `cb.__name__`
+        :param timeout: How long SIF-edge waits for the cb using Golang's time representation, e.g., 25m. With
+            `job=True`, how long the job may run for instead, enforced through its deadline
+        :param defer: Postpones the registration with the scheduler until :meth:`register` is called
+        :param executor: Where the cb runs, i.e., `thread`, `process` or `loop`, defaults to `HANDLER_EXECUTOR` or `thread`
+        :param job: Answers invocations with `202 Accepted` and runs the cb in the background
+        :param done_event: Event sent to the scheduler with the job's status once it finished, only with `job=True`
         """
         endpoint = path or f"/api/{cb.__name__}"
         if not endpoint.startswith("/api"):
             endpoint = "/api/" + \
                 (endpoint[1:] if endpoint.startswith("/") else endpoint)
 
-        self.add_api_route(
-            endpoint, cb, methods=[method.upper()])
-
+        seconds = durationpy.from_str(timeout).total_seconds() if timeout is not None else None
+        handler = self.pools.wrap(cb, Offload(executor) if executor else self.executor)
+        if job:
+            handler = self.__as_job(name, handler, done_event, seconds)
+        if self.loop is None:
+            self.add_api_route(
+                endpoint, handler, methods=[method.upper()])
+        else:
+            self.dynamic.add(endpoint, handler, [method])
         self.openapi_schema = None
-        self.setup()
+
+        evts = evts if isinstance(evts, list) else [evts]
+        if self.bus is not None and len(evts) == 1:
+            self.bus.subscribe(evts[0], name, endpoint, method, seconds)
 
         endpoint = f"{self.local_ip}:{self.local_port}{endpoint}"
-        logger.info(f"Registering the endpoint {endpoint} to {self.scheduler}")
+        self.deployed[name] = endpoint
+        logger.info(f"Deploying the endpoint {endpoint} to {self.scheduler}")
 
-        url = f"{self.scheduler}/api/function"
         if not self.mock:
-            evts = evts if isinstance(evts, list) else [evts]
+            fn = dict(name=name, url=endpoint, subs=evts, method=method.upper())
+            if seconds is not None:
+                fn["timeout"] = seconds
+            self.rejected = [f for f in self.rejected if f["name"] != name]
+            self.pending.append(fn)
+            if not defer:
+                self.register()
+
+        logger.info(
+            f"Deployed endpoint {endpoint} for {cb.__name__}")
+
+    def __as_job(self, name: str, handler: Callable[..., Any], done_event: Optional[str],
+                 timeout: Optional[float]) -> Callable[..., Any]:
+        @functools.wraps(handler)
+        async def endpoint(*args, **kwargs):
+            for v in [*args, *kwargs.values()]:
+                if isinstance(v, Request):
+                    # The body cannot be read anymore once the response is sent
+                    await v.body()
+            job = self.jobs.submit(name, handler, args, kwargs, done_event, timeout)
+            return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status.value,
+                                                          "status_url": f"/api/jobs/{job.id}"})
+
+        return endpoint
+
+    def add_trigger(self, trigger: AsyncTrigger) -> AsyncTrigger:
+        """
+        Runs the trigger on the application's event loop, right away if the
+        application has already started, otherwise once it starts
+
+        :param trigger: :class:`AsyncTrigger <trigger.AsyncTrigger>` to be run
+        :returns: the given trigger
+        """
+        self.triggers = [t for t in self.triggers if not t.done]
+        self.triggers.append(trigger)
+        if self.loop is not None and self.__runs(trigger):
+            self.loop.call_soon_threadsafe(trigger.start, self.loop)
+        return trigger
+
+    @property
+    def leader(self) -> bool:
+        """
+        Whether this process runs the periodic triggers, always without leader election
+        """
+        return self.elector is None or self.elector.is_leader
+
+    def __runs(self, trigger: AsyncTrigger) -> bool:
+        return not trigger.schedule.periodic or self.leader
+
+    def __elected(self):
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.__lead)
+
+    def __demoted(self):
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.__follow)
+
+    def __lead(self):
+        triggers = [t for t in self.triggers if t.schedule.periodic and not t.done]
+        for trigger in triggers:
+            trigger.start(self.loop)
+        logger.info(f"Leading, started {len(triggers)} periodic triggers")
+
+    def __follow(self):
+        for trigger in self.triggers:
+            if trigger.schedule.periodic:
+                trigger.pause()
+        logger.info("No longer leading, paused the periodic triggers")
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the application started and every deployed function is
+        registered with the scheduler, i.e., none is waiting or was rejected
+        """
+        return self.loop is not None and len(self.pending) == 0 and len(self.inflight) == 0 \
+            and len(self.rejected) == 0
+
+    def register(self):
+        """
+        Hands the functions deployed so far to the background task, which
+        registers them with the scheduler in a single request once the
+        application has started
+        """
+        if self.mock:
+            self.pending = []
+        elif self.loop is not None and self.registering is not None:
+            self.loop.call_soon_threadsafe(self.registering.set)
+
+    async def __register_loop(self):
+        backoff = 1.0
+        while True:
+            await self.registering.wait()
+            self.registering.clear()
+            if len(self.pending) == 0:
+                continue
+
+            self.inflight, self.pending = self.pending, []
+            failures = await asyncio.get_running_loop().run_in_executor(
+                None, self.__send, self.inflight)
+            fns, self.inflight = self.inflight, []
+            registered = len(fns) - len(failures)
+            if registered > 0:
+                logger.info(f"Registered {registered} functions with {self.scheduler}")
+
+            retry, retry_reason = [], None
+            for fn, status, reason in failures:
+                if status is not None and 400 <= status < 500:
+                    # Retrying would not change the answer of the scheduler
+                    logger.error(f"The scheduler rejected the registration of {fn['name']} because {reason}")
+                    self.rejected = [f for f in self.rejected if f["name"] != fn["name"]] + [fn]
+                    self.registration_error = reason
+                else:
+                    retry.append(fn)
+                    retry_reason = reason
+            if len(failures) == 0 and len(self.rejected) == 0:
+                self.registration_error = None
+            if len(retry) == 0:
+                backoff = 1.0
+            else:
+                logger.warning(
+                    f"Failure registering {[fn['name'] for fn in retry]} with the scheduler because "
+                    f"{retry_reason}, retrying in {backoff}s")
+                self.registration_error = retry_reason
+                self.pending = retry + self.pending
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                self.registering.set()
+
+    def __send(self, fns: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[int], str]]:
+        """
+        Registers the functions with the scheduler in a single request. If
+        the scheduler lacks the bulk endpoint or rejects the batch, registers
+        them one request per function, so that only the offending ones fail
+
+        :returns: each function that failed to register, with the status of the failed response, `None` if the
+            scheduler was not reached, and the failure reason
+        """
+        http = urllib3.PoolManager()
+        if len(fns) > 1:
+            try:
+                res = http.request('POST', f"{self.scheduler}/api/functions",
+                                   json=dict(functions=fns), retries=False)
+            except Exception as err:
+                return [(fn, None, str(err)) for fn in fns]
+            if res.status < 300:
+                return []
+            if res.status in (404, 405):
+                logger.warning(
+                    "The scheduler does not accept bulk registrations, registering functions one by one")
+            elif 400 <= res.status < 500:
+                logger.warning(
+                    f"The scheduler rejected the batch because {res.reason}, registering functions one by one")
+            else:
+                return [(fn, res.status, res.reason) for fn in fns]
+
+        failures = []
+        for i, fn in enumerate(fns):
+            try:
+                res = http.request('POST', f"{self.scheduler}/api/function",
+                                   json=fn, retries=False)
+            except Exception as err:
+                # The scheduler is unreachable, so the remaining functions are retried later as well
+                return failures + [(f, None, str(err)) for f in fns[i:]]
+            if res.status >= 300:
+                failures.append((fn, res.status, res.reason))
+        return failures
+
+    def undeploy(self, name: str):
+        """
+        Deregisters the endpoint of this replica from the function `name`.
+        The scheduler keeps the endpoints of the remaining replicas, if any
+
+        :param name: Function name given upon deploying
+        """
+        endpoint = self.deployed.pop(name, None)
+        if self.bus is not None:
+            self.bus.unsubscribe(name)
+        self.pending = [fn for fn in self.pending if fn["name"] != name]
+        self.rejected = [fn for fn in self.rejected if fn["name"] != name]
+        if endpoint is None or self.mock:
+            return
+        try:
             http = urllib3.PoolManager()
-            res = http.request('POST', url, json=dict(
-                name=name, url=endpoint, subs=evts, method=method.upper()), retries=urllib3.Retry(5))
+            res = http.request('DELETE', f"{self.scheduler}/api/function",
+                               json=dict(name=name, url=endpoint), retries=urllib3.Retry(5))
             if res.status >= 300:
                 logger.error(
-                    f"Failure registering function with the scheduler because {res.reason}")
+                    f"Failure deregistering function with the scheduler because {res.reason}")
+        except Exception as err:
+            logger.error("Failure during HTTP request")
+            logger.error(err)
 
-        logger.info(
-            f"Registered endpoint {endpoint} for {cb.__name__}")
+    @asynccontextmanager
+    async def __lifespan(self, app: FastAPI):
+        self.loop = asyncio.get_running_loop()
+        self.registering = asyncio.Event()
+        self.registering.set()
+        registrar = self.loop.create_task(self.__register_loop())
+        self.jobs.start()
+        if self.bus is not None:
+            self.bus.attach(self, self.loop)
+        if self.use_channel:
+            self.channel = ServiceChannel(self.scheduler, f"{self.local_ip}:{self.local_port}")
+            self.channel.start(self, self.loop)
+            get_emitter().channel = self.channel
+        started = [t for t in self.triggers if self.__runs(t)]
+        for trigger in started:
+            trigger.start(self.loop)
+        logger.info(f"Started {len(started)} triggers")
+        if self.elector is not None:
+            self.elector.start()
+        try:
+            if self.app_lifespan is None:
+                yield
+            else:
+                async with self.app_lifespan(app) as state:
+                    yield state
+        finally:
+            registrar.cancel()
+            self.jobs.stop()
+            if self.bus is not None:
+                self.bus.detach()
+            if self.elector is not None:
+                # Releasing the lease lets another process take over right away
+                await asyncio.get_running_loop().run_in_executor(None, self.elector.stop)
+            for trigger in self.triggers:
+                trigger.cancel()
+            self.triggers.clear()
+            self.loop = None
+            self.pools.shutdown()
+            # Flushing blocks, so it must not hold up the event loop
+            await asyncio.get_running_loop().run_in_executor(None, flush_emitters, 5)
+            if self.channel is not None:
+                get_emitter().channel = None
+                self.channel.stop()
+                self.channel = None
+
+    def openapi(self) -> Dict[str, Any]:
+        schema = super(LocalGateway, self).openapi()
+        if self.dynamic.routes and self.dynamic_schema != (id(schema), self.dynamic.version):
+            dynamic = get_openapi(title=self.title, version=self.version,
+                                  routes=list(self.dynamic.routes.values()))
+            for path, operations in dynamic.get("paths", {}).items():
+                schema.setdefault("paths", {}).setdefault(path, {}).update(operations)
+            for kind, components in dynamic.get("components", {}).items():
+                schema.setdefault("components", {}).setdefault(kind, {}).update(components)
+            self.dynamic_schema = (id(schema), self.dynamic.version)
+        return schema
+
+    async def metrics(self):
+        """
+        Runtime metrics of the service, e.g., the delivery of emitted events
+        and the queueing of handlers waiting for a worker
+        """
+        metrics = {"events": get_emitter().metrics(), "handlers": self.pools.metrics(), "jobs": self.jobs.metrics()}
+        if self.bus is not None:
+            metrics["bus"] = self.bus.metrics()
+        if self.channel is not None:
+            metrics["channel"] = self.channel.metrics()
+        if self.elector is not None:
+            metrics["leader"] = self.leader
+        return metrics
+
+    async def __health(self):
+        """
+        Cheap liveness route probed by SIF-edge and served at `/live`
+        """
+        return {"status": "ok"}
+
+    async def __ready(self):
+        """
+        Readiness route, failing until every deployed function is registered
+        and while the scheduler rejects any of them
+        """
+        status = {"status": "ready" if self.ready else "rejected" if self.rejected else "registering",
+                  "pending": len(self.pending) + len(self.inflight),
+                  "rejected": [fn["name"] for fn in self.rejected],
+                  "error": self.registration_error}
+        return JSONResponse(status_code=200 if self.ready else 503, content=status)
+
+    async def __job_status(self, job_id: str):
+        """
+        Status of a job, along with its result once it succeeded
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return JSONResponse(status_code=404, content={"detail": f"Job {job_id} not found"})
+        return job.to_dict()
+
+    async def __track_deadline(self, request: Request, call_next):
+        deadline = None
+        try:
+            deadline = float(request.headers[DEADLINE_HEADER])
+        except (KeyError, ValueError):
+            pass
+        token = set_deadline(deadline)
+        try:
+            return await call_next(request)
+        finally:
+            reset_deadline(token)
+
+    async def __deadline_exceeded(self, request: Request, exc: DeadlineExceeded):
+        logger.warning(f"Aborted {request.url.path}: {exc}")
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
 
     def __get_hostname(self):
+        pod_ip = os.environ.get("POD_IP", None)
+        if pod_ip is not None:
+            # Each replica registers its own address, so SIF-edge can balance
+            # the invocations across them instead of going through the service
+            logger.info("Using the pod IP for the deployment")
+            self.local_ip = pod_ip
+            self.local_port = os.environ.get("POD_PORT", "8000")
+            return
+
         is_k8s = os.environ.get("KUBERNETES_SERVICE_PORT", None) is not None
 
         if is_k8s:
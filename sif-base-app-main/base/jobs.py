@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+
+from abc import ABC
+from enum import Enum
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from .deadline import get_deadline, set_deadline, reset_deadline
+from .emitter import get_emitter
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(ABC):
+    """
+    Invocation of a function deployed in job mode, see :class:`JobQueue
+    <JobQueue>`
+
+    :param name: Function name given upon deploying
+    :param cb: Endpoint running the function
+    :param args: Positional arguments of the invocation
+    :param kwargs: Keyword arguments of the invocation
+    :param done_event: Event sent to the scheduler once the job finished
+    :param timeout: Seconds the job may run for, enforced through its deadline
+    """
+
+    def __init__(self, name: str, cb: Callable[..., Any], args: tuple, kwargs: Dict[str, Any],
+                 done_event: str = None, timeout: float = None):
+        super(Job, self).__init__()
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.cb = cb
+        self.args = args
+        self.kwargs = kwargs
+        self.done_event = done_event
+        self.timeout = timeout
+        self.status = JobStatus.QUEUED
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return jsonable_encoder(dict(id=self.id, name=self.name, status=self.status.value,
+                                     submitted_at=self.submitted_at, started_at=self.started_at,
+                                     finished_at=self.finished_at, result=self.result, error=self.error))
+
+
+class JobQueue(ABC):
+    """
+    Background queue running the invocations of functions deployed in job
+    mode on the :class:`LocalGateway <gateway.LocalGateway>`.
+
+    The invocation is answered with `202 Accepted` and the job ID right
+    away, so SIF-edge's dispatcher neither holds the connection nor waits
+    for the function until its timeout. `workers` tasks on the event loop
+    take the jobs in the order they were submitted, and their handlers still
+    run on the executor they were deployed with. Each job gets the deadline
+    of the invocation, counted from when it starts running, so that
+    :func:`deadline.check_deadline` still works in job mode. The status of each job is
+    kept for `retention` seconds once it finished, and an optional event is
+    sent to the scheduler with it.
+
+    :param workers: Number of jobs running at once, defaults to `JOB_WORKERS` or 2
+    :param retention: Seconds finished jobs are kept, defaults to `JOB_RETENTION` or 3600
+    :param mock: Indicates if the completion events must not be sent
+    """
+
+    def __init__(self, workers: int = None, retention: float = None, mock: bool = False):
+        super(JobQueue, self).__init__()
+        self.workers = workers or int(os.environ.get("JOB_WORKERS", "2"))
+        self.retention = retention if retention is not None else float(os.environ.get("JOB_RETENTION", "3600"))
+        self.mock = mock
+        self.jobs: Dict[str, Job] = OrderedDict()
+        self.queue: asyncio.Queue = None
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """
+        Starts the workers on the running event loop
+        """
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.get_running_loop().create_task(self.__work()) for _ in range(self.workers)]
+
+    def stop(self):
+        """
+        Cancels the workers, the jobs still queued or running are marked as cancelled
+        """
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        for job in self.jobs.values():
+            if not job.done:
+                job.status = JobStatus.CANCELLED
+                job.finished_at = time.time()
+
+    def submit(self, name: str, cb: Callable[..., Any], args: tuple, kwargs: Dict[str, Any],
+               done_event: str = None, timeout: float = None) -> Job:
+        """
+        Queues an invocation, must be called from the event loop
+
+        :param timeout: Seconds the job may run for, defaults to the time left until the invocation's deadline
+        :returns: the queued job
+        """
+        self.__prune()
+        if timeout is None and get_deadline() is not None:
+            timeout = max(get_deadline() - time.time(), 0.0)
+        job = Job(name, cb, args, kwargs, done_event, timeout)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        logger.info(f"Queued job {job.id} of {name}, {self.queue.qsize()} jobs waiting")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def __prune(self):
+        limit = time.time() - self.retention
+        for job_id in [j.id for j in self.jobs.values() if j.done and j.finished_at < limit]:
+            del self.jobs[job_id]
+
+    async def __work(self):
+        while True:
+            job = await self.queue.get()
+            if job.done:
+                continue
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            token = set_deadline(job.started_at + job.timeout if job.timeout is not None else None)
+            try:
+                job.result = await job.cb(*job.args, **job.kwargs)
+                job.status = JobStatus.SUCCEEDED
+            except asyncio.CancelledError:
+                job.status = JobStatus.CANCELLED
+                raise
+            except Exception as err:
+                logger.error(f"Job {job.id} of {job.name} failed: {err}", exc_info=True)
+                job.status = JobStatus.FAILED
+                job.error = str(err)
+            finally:
+                reset_deadline(token)
+                job.finished_at = time.time()
+                job.args, job.kwargs = (), {}
+            logger.info(f"Job {job.id} of {job.name} {job.status.value} after "
+                        f"{job.finished_at - job.started_at:.1f}s")
+            if job.done_event is not None and not self.mock:
+                get_emitter().emit(job.done_event, job.to_dict())
+
+    def metrics(self) -> Dict[str, int]:
+        metrics = {status.value: 0 for status in JobStatus}
+        for job in self.jobs.values():
+            metrics[job.status.value] += 1
+        return metrics
@@ -0,0 +1,224 @@
+import random
+
+from abc import ABC
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+
+
+class CronExpression(ABC):
+    """
+    Standard five-field cron expression, i.e., `minute hour day-of-month month
+    day-of-week`, evaluated in the local time of the process.
+
+    Each field accepts `*`, values, ranges and steps, e.g., `*/15`, `1-5` or
+    `0,30`. Day-of-week goes from 0 (Sunday) to 6, 7 being Sunday as well. As
+    in cron, if both days are restricted, either of them must match. The
+    aliases `@hourly`, `@daily`, `@weekly`, `@monthly` and `@yearly` are
+    accepted as well.
+
+    :param expr: Cron expression, e.g., `30 2 * * *` for every day at 02:30
+    """
+
+    # Lower and upper bounds of each field
+    BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr: str):
+        super(CronExpression, self).__init__()
+        self.expr = expr
+        fields = ALIASES.get(expr.strip(), expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expr} must have five fields")
+
+        parsed = [self.__parse(field, lo, hi) for field, (lo, hi) in zip(fields, self.BOUNDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def __parse(field: str, lo: int, hi: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            rng, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if rng == "*":
+                    start, end = lo, hi
+                elif "-" in rng:
+                    start, end = (int(v) for v in rng.split("-", 1))
+                else:
+                    start = int(rng)
+                    end = hi if step > 1 else start
+            except ValueError:
+                raise ValueError(f"Invalid cron field {field}")
+            if step < 1 or start < lo or end > hi or start > end:
+                raise ValueError(f"Cron field {field} is out of the range {lo}-{hi}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def __day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, ts: float) -> float:
+        """
+        :param ts: UNIX timestamp
+        :returns: the first UNIX timestamp matching the expression strictly after `ts`
+        """
+        dt = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self.__day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f"Cron expression {self.expr} never matches")
+
+
+class TimeWindow(ABC):
+    """
+    Daily window of local time, e.g., `02:00-05:00`. Windows ending before
+    they start wrap around midnight, e.g., `22:00-06:00`.
+
+    :param window: Start and end of the window as `HH:MM-HH:MM`
+    """
+
+    def __init__(self, window: str):
+        super(TimeWindow, self).__init__()
+        self.window = window
+        try:
+            start, end = window.split("-")
+            self.start = self.__minutes(start)
+            self.end = self.__minutes(end)
+        except ValueError:
+            raise ValueError(f"Time window {window} must look like HH:MM-HH:MM")
+        if self.start == self.end:
+            raise ValueError(f"Time window {window} is empty")
+
+    @staticmethod
+    def __minutes(value: str) -> int:
+        hour, minute = (int(v) for v in value.strip().split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(value)
+        return hour * 60 + minute
+
+    def __at(self, ts: float, minutes: int) -> float:
+        midnight = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (midnight + timedelta(minutes=minutes)).timestamp()
+
+    def contains(self, ts: float) -> bool:
+        dt = datetime.fromtimestamp(ts)
+        minute = dt.hour * 60 + dt.minute + dt.second / 60
+        if self.start < self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def bounds(self, ts: float) -> Tuple[float, float]:
+        """
+        :returns: the start and end of the window containing `ts`, or of the next one
+        """
+        start = self.__at(ts, self.start)
+        if self.contains(ts):
+            if start > ts:
+                # Wrapping window which opened the day before
+                start = self.__at(ts - 86400, self.start)
+        elif start <= ts:
+            start = self.__at(ts + 86400, self.start)
+        end = self.__at(start, self.end)
+        if end <= start:
+            end = self.__at(start + 86400, self.end)
+        return start, end
+
+
+class Schedule(ABC):
+    """
+    Computes when a trigger fires, as UNIX timestamps.
+
+    Runs are either `interval` seconds apart or follow a `cron` expression.
+    Each run is then postponed into the next `window`, if it falls outside
+    of it, and delayed by a random amount up to `jitter` seconds, without
+    leaving the window.
+
+    :param interval: Seconds between runs, `None` if it runs only once or follows `cron`
+    :param cron: :class:`CronExpression <CronExpression>` the runs follow
+    :param jitter: Seconds each run is delayed at most
+    :param window: :class:`TimeWindow <TimeWindow>` the runs must happen within
+    """
+
+    def __init__(self, interval: Optional[float] = None, cron: CronExpression = None, jitter: float = 0,
+                 window: TimeWindow = None):
+        super(Schedule, self).__init__()
+        self.interval = interval
+        self.cron = cron
+        self.jitter = jitter
+        self.window = window
+
+    @property
+    def periodic(self) -> bool:
+        return self.interval is not None or self.cron is not None
+
+    def next_after(self, nominal: float, now: float) -> float:
+        """
+        :param nominal: Time the last run was due, without window and jitter
+        :param now: Current time, the runs due until then are skipped
+        :returns: the time the next run is due
+        """
+        if self.cron is not None:
+            return self.cron.next_after(max(nominal, now))
+        due = nominal + self.interval
+        if due <= now:
+            due += (int((now - due) // self.interval) + 1) * self.interval
+        return due
+
+    def missed(self, last: float, now: float, limit: int = 1000) -> Tuple[float, int]:
+        """
+        :param last: Time of the last run
+        :param now: Current time
+        :returns: the time the next run is due and how many runs were due since `last`
+        """
+        if self.cron is None:
+            missed = max(int((now - last) // self.interval), 0)
+            return last + (missed + 1) * self.interval, missed
+
+        missed, due = 0, self.cron.next_after(last)
+        while due <= now and missed < limit:
+            missed += 1
+            due = self.cron.next_after(due)
+        return self.cron.next_after(now) if due <= now else due, missed
+
+    def place(self, due: float) -> float:
+        """
+        Applies the window and the jitter to a run
+
+        :param due: Time the run is due
+        :returns: the time the run must fire
+        """
+        latest = None
+        if self.window is not None:
+            start, end = self.window.bounds(due)
+            due = max(due, start)
+            latest = end
+        if self.jitter > 0:
+            jitter = self.jitter if latest is None else min(self.jitter, max(latest - due, 0))
+            due += random.uniform(0, jitter)
+        return due
+
@@ -1,4 +1,4 @@
-from base import LocalGateway, base_logger, PeriodicTrigger, ExampleEventFabric
+from base import LocalGateway, base_logger, AsyncPeriodicTrigger, ExampleEventFabric
 
 
 app = LocalGateway()
@@ -35,4 +35,4 @@ app.deploy(base_fn, "fn-fabric", "CreateFn")
 
 evt = ExampleEventFabric()
 
-tgr = PeriodicTrigger(evt, "30s", "1m")
+tgr = app.add_trigger(AsyncPeriodicTrigger(evt, "30s", "1m"))
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import threading
+import unittest
+
+from typing import Any, Tuple
+from unittest import mock
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from base import LocalGateway, BaseEventFabric
+from base.trigger import AsyncOneShotTrigger
+
+
+class LocalEvent(BaseEventFabric):
+    def call(self, *args, **kwargs) -> Tuple[str, Any]:
+        return "LocalBusTestEvent", {"x": 1}
+
+
+class LocalBusTest(unittest.TestCase):
+    """
+    Events emitted by the process invoke the local subscribers in-process,
+    both from the event loop, e.g., async triggers, and from other threads,
+    e.g., the timer of threaded triggers, without blocking either
+    """
+
+    def setUp(self):
+        self.invoked = []
+        self.emitter = mock.Mock()
+        self.emitter.emit_async = mock.AsyncMock(return_value=True)
+        patcher = mock.patch("base.event.get_emitter", return_value=self.emitter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.app = LocalGateway(mock=True, local_bus=True)
+
+        async def on_local_event(request: Request):
+            await asyncio.sleep(0.5)
+            self.invoked.append(threading.current_thread().name)
+            return {}
+
+        self.app.deploy(on_local_event, "on_local_event", "LocalBusTestEvent", method="POST")
+        self.addCleanup(self.app.bus.unsubscribe, "on_local_event")
+
+    def test_async_trigger_invokes_locally(self):
+        with TestClient(self.app):
+            self.app.add_trigger(AsyncOneShotTrigger(LocalEvent(), wait_time="0s"))
+            time.sleep(1)
+
+        self.assertEqual(len(self.invoked), 1)
+        self.emitter.emit_async.assert_awaited_once()
+        self.assertEqual(self.emitter.emit_async.await_args.args[3], ["on_local_event"])
+
+    def test_sync_call_returns_before_local_invocation(self):
+        with TestClient(self.app):
+            started = time.monotonic()
+            LocalEvent()()
+            elapsed = time.monotonic() - started
+            self.emitter.emit.assert_not_called()
+            time.sleep(1)
+
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(len(self.invoked), 1)
+        self.emitter.emit.assert_called_once()
+        self.assertEqual(self.emitter.emit.call_args.args[3], ["on_local_event"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
-from .base import Invocation, Function, Event, EventRequest, BaseFunction, DeleteFunction
+from .base import Invocation, Function, Endpoint, Event, EventRequest, EventBatch, BaseFunction, FunctionBatch, DeleteFunction, \
+    DeadLetterRequest, LeaseRequest
+from .retry import RetryPolicy
 
-__all__ = ["Invocation", "Function", "Event",
-           "EventRequest", "BaseFunction", "DeleteFunction"]
+__all__ = ["Invocation", "Function", "Endpoint", "Event",
+           "EventRequest", "EventBatch", "BaseFunction", "FunctionBatch", "DeleteFunction", "DeadLetterRequest", "LeaseRequest",
+           "RetryPolicy"]
@@ -1,26 +1,61 @@
+import time
+import uuid
 import pytz
 import urllib3
 import logging
 
 from abc import ABC
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, TYPE_CHECKING
 from datetime import datetime
 from pydantic import BaseModel
 
-from .status import EventStatus
+from .status import EventStatus, LivenessState
+from .retry import RetryPolicy
+
+if TYPE_CHECKING:
+    from dispatcher.pool import ConnectionPools
+    from dispatcher.channel import ChannelRegistry
 
 logger = logging.getLogger("fastapi_cli")
 
 logging.getLogger("requests").setLevel(logging.DEBUG)
 
+# Absolute UNIX time (in seconds) until which the dispatcher waits for a response
+DEADLINE_HEADER = "X-SIF-Deadline"
+
 
 class EventRequest(BaseModel):
     name: str
     data: Optional[Dict[Any, Any]] | Optional[Any] = None
+    # Functions which already handled the event within the emitting service
+    handled: Optional[List[str]] = None
+
+
+class EventBatch(BaseModel):
+    events: List[EventRequest]
 
 
 class DeleteFunction(BaseModel):
     name: str
+    url: Optional[str] = None
+
+
+class LeaseRequest(BaseModel):
+    key: str
+    holder: str
+    ttl: Optional[float] = 15.0
+
+
+class DeadLetterRequest(BaseModel):
+    ids: Optional[List[str]] = None
+
+
+class RetryConfig(BaseModel):
+    max_attempts: int = 5
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    jitter: float = 0.5
+    retry_on: List[str] = ["5xx", "429"]
 
 
 class BaseFunction(BaseModel):
@@ -29,13 +64,25 @@ class BaseFunction(BaseModel):
     url: str
     method: Optional[str] = "GET"
     mock: Optional[bool] = False
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    pool_size: Optional[int] = None
+    retry: Optional[RetryConfig] = None
+    timeout: Optional[float] = None
+    balance: Optional[str] = "least_outstanding"
+
+
+class FunctionBatch(BaseModel):
+    functions: List[BaseFunction]
 
 
 class Event(ABC):
-    def __init__(self, name: str, data: List[Dict[Any, Any]] | Dict[Any, Any] | Any = None):
+    def __init__(self, name: str, data: List[Dict[Any, Any]] | Dict[Any, Any] | Any = None,
+                 handled: List[str] = None):
         super(Event, self).__init__()
         self.name: str = name
         self.data: List[Dict[Any, Any]] | Dict[Any, Any] = data
+        self.handled: List[str] = handled or []
         self.status: EventStatus = EventStatus.CREATED
         self.timestamp: str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")
 
@@ -46,29 +93,99 @@ class Invocation(ABC):
     requirements.
     """
 
-    def __init__(self, url: str, method: str, mock: bool, ** kwargs):
+    def __init__(self, url: str, method: str, mock: bool, name: str = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 pool_size: int = None, retry: RetryPolicy = None, timeout: float = None,
+                 endpoints: List[str] = None, balance: str = "least_outstanding", ** kwargs):
         super(Invocation, self).__init__()
+        self.id = uuid.uuid4().hex
         self.kwargs = kwargs
         self.url = url
+        self.endpoints: List[str] = endpoints or [url]
+        self.balance = balance
         self.method = method
         self.mock = mock
-
-    def invoke(self):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.retry = retry
+        self.timeout = timeout
+        self.timed_out = False
+        self.attempts = 0
+        self.last_status: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.created: str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # Invocations restored from older dead-letter checkpoints lack the newer attributes
+        defaults = dict(timeout=None, timed_out=False, endpoints=[state["url"]],
+                        balance="least_outstanding")
+        self.__dict__.update({**defaults, **state})
+
+    def invoke(self, pools: "ConnectionPools" = None, channels: "ChannelRegistry" = None) -> bool:
+        """
+        Dispatches the invocation to the remote function, over the channel
+        of its replica if it opened one
+
+        :param pools: Dispatcher's connection pools, a one-off connection is used if not given
+        :param channels: Persistent channels opened by the replicas
+        :returns: whether the remote function accepted the invocation
+        """
+        self.attempts += 1
+        self.last_status, self.last_error, self.timed_out = None, None, False
         try:
             if not self.mock:
-                # TODO: Add retries method and provide feedback with function name
                 if self.method == "GET":
                     self.kwargs = {}
 
-                res = urllib3.request(self.method, self.url, **self.kwargs)
+                headers = {}
+                if self.timeout is not None:
+                    headers[DEADLINE_HEADER] = f"{time.time() + self.timeout:.3f}"
+
+                res = None
+                if channels is not None:
+                    # None if the replica has no channel open or no credit left
+                    res = channels.request(self.method, self.url, headers=headers,
+                                           timeout=self.timeout, **self.kwargs)
+                if res is None and pools is not None:
+                    res = pools.request(self.method, self.url,
+                                        connect_timeout=self.connect_timeout,
+                                        read_timeout=self.read_timeout,
+                                        total_timeout=self.timeout,
+                                        pool_size=self.pool_size, retries=False,
+                                        headers=headers, **self.kwargs)
+                elif res is None:
+                    res = urllib3.request(self.method, self.url, headers=headers,
+                                          timeout=self.timeout, **self.kwargs)
+                self.last_status = res.status
+                # 504 is returned by handlers giving up on their deadline
+                self.timed_out = res.status == 504
                 if res.status >= 300:
-                    logger.warn(
-                        f"failure to invoke remote resource because: [{res.reason}]")
-                logger.info("invocation has been dispatched")
+                    self.last_error = res.reason
+                    logger.warning(
+                        f"failure to invoke {self.name} (attempt {self.attempts}) because: [{res.reason}]")
+                    return False
+                logger.info(f"invocation of {self.name} has been dispatched")
+        except urllib3.exceptions.ReadTimeoutError as err:
+            self.timed_out = True
+            self.last_error = str(err)
+            logger.error(
+                f"Invocation of {self.name} timed out (attempt {self.attempts})...")
+            return False
         except Exception as err:
-            logger.error("Failure during invocation...")
+            self.last_error = str(err)
+            logger.error(
+                f"Failure during invocation of {self.name} (attempt {self.attempts})...")
             logger.error(err)
-        return
+            return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return dict(id=self.id, name=self.name, url=self.url, method=self.method,
+                    attempts=self.attempts, last_status=self.last_status,
+                    last_error=self.last_error, timed_out=self.timed_out,
+                    created=self.created)
 
 
 class RemoteInvocation(Invocation):
@@ -76,6 +193,56 @@ class RemoteInvocation(Invocation):
         super(RemoteInvocation, self).__init__()
 
 
+class Endpoint(ABC):
+    """
+    Replica serving a function, along with its liveness as observed by the
+    health probes of the scheduler.
+    """
+
+    def __init__(self, url: str):
+        super(Endpoint, self).__init__()
+        self.url: str = url
+        self.liveness: LivenessState = LivenessState.UNKNOWN
+        self.failed_probes = 0
+        self.last_seen = None
+
+    def reset(self):
+        self.liveness = LivenessState.UNKNOWN
+        self.failed_probes = 0
+
+    def health_url(self) -> str:
+        """
+        Returns the health route of the service hosting the endpoint
+        """
+        ref = self.url if "://" in self.url else f"http://{self.url}"
+        parsed = urllib3.util.parse_url(ref)
+        port = f":{parsed.port}" if parsed.port else ""
+        return f"{parsed.scheme}://{parsed.host}{port}/health"
+
+    def record_probe(self, alive: bool, threshold: int) -> bool:
+        """
+        Updates the liveness of the endpoint upon a health probe
+
+        :param alive: Outcome of the probe
+        :param threshold: Consecutive failed probes after which the endpoint is considered dead
+        :returns: whether the liveness state changed
+        """
+        prev = self.liveness
+        if alive:
+            self.failed_probes = 0
+            self.last_seen = int(datetime.now(
+                pytz.timezone("Europe/Berlin")).timestamp()*1000)
+            self.liveness = LivenessState.ALIVE
+        else:
+            self.failed_probes += 1
+            if self.failed_probes >= threshold:
+                self.liveness = LivenessState.DEAD
+        return prev != self.liveness
+
+    def status(self) -> Dict[str, Any]:
+        return dict(url=self.url, liveness=self.liveness.name, last_seen=self.last_seen)
+
+
 class Function(ABC):
     """
     Class identifying a function to be called upon an event.
@@ -87,25 +254,105 @@ class Function(ABC):
     correspondg event(s) data.
     """
 
-    def __init__(self, name: str, subs: List[str], ref: str, mock: bool = False, method: str = "GET"):
+    def __init__(self, name: str, subs: List[str], ref: str, mock: bool = False, method: str = "GET",
+                 connect_timeout: float = None, read_timeout: float = None, pool_size: int = None,
+                 retry: RetryPolicy = None, timeout: float = None, balance: str = "least_outstanding"):
         super(Function, self).__init__()
 
         self.name: str = name
-        self.ref: str = ref
+        self.endpoints: List[Endpoint] = [Endpoint(ref)]
+        self.balance: str = balance
         self.method: str = method
+        self.connect_timeout: Optional[float] = connect_timeout
+        self.read_timeout: Optional[float] = read_timeout
+        self.pool_size: Optional[int] = pool_size
+        self.retry: Optional[RetryPolicy] = retry
+        self.timeout: Optional[float] = timeout
         self.events: Dict[str, List[Event]] = {}
         self.subs: List[str] = subs
         self.ready: List[List[str]] = []
         self.last_pos = None
         self.mock = mock
         self.last_invoke = None
+        self.parked: List[Invocation] = []
         self.reset_fn()
 
+    def __setstate__(self, state: Dict[str, Any]):
+        # Functions restored from older checkpoints lack the newer attributes
+        defaults = dict(connect_timeout=None, read_timeout=None,
+                        pool_size=None, retry=None, timeout=None,
+                        balance="least_outstanding", parked=[])
+        if "endpoints" not in state:
+            endpoint = Endpoint(state.pop("ref"))
+            endpoint.liveness = state.pop("liveness", LivenessState.UNKNOWN)
+            endpoint.failed_probes = state.pop("failed_probes", 0)
+            endpoint.last_seen = state.pop("last_seen", None)
+            state["endpoints"] = [endpoint]
+        self.__dict__.update({**defaults, **state})
+
+    @property
+    def ref(self) -> Optional[str]:
+        """
+        URL of the first endpoint serving the function
+        """
+        return self.endpoints[0].url if self.endpoints else None
+
+    @property
+    def liveness(self) -> LivenessState:
+        """
+        A function is alive while any of its endpoints is alive and dead once
+        all of them are
+        """
+        states = [ep.liveness for ep in self.endpoints]
+        if LivenessState.ALIVE in states:
+            return LivenessState.ALIVE
+        if states and all(state == LivenessState.DEAD for state in states):
+            return LivenessState.DEAD
+        return LivenessState.UNKNOWN
+
+    @property
+    def last_seen(self) -> Optional[int]:
+        seen = [ep.last_seen for ep in self.endpoints if ep.last_seen is not None]
+        return max(seen) if seen else None
+
+    def get_endpoint(self, url: str) -> Optional[Endpoint]:
+        for ep in self.endpoints:
+            if ep.url == url:
+                return ep
+        return None
+
+    def add_endpoint(self, url: str):
+        """
+        Adds a replica serving the function. A replica registering again is
+        considered restarted, so its liveness is reset
+        """
+        ep = self.get_endpoint(url)
+        if ep is None:
+            self.endpoints.append(Endpoint(url))
+            logger.info(f"Endpoint {url} added to function {self.name}")
+        else:
+            ep.reset()
+
+    def remove_endpoint(self, url: str) -> bool:
+        ep = self.get_endpoint(url)
+        if ep is None:
+            return False
+        self.endpoints.remove(ep)
+        logger.info(f"Endpoint {url} removed from function {self.name}")
+        return True
+
+    def dispatchable(self) -> List[str]:
+        """
+        Returns the URLs of the endpoints which are not known to be dead
+        """
+        return [ep.url for ep in self.endpoints if ep.liveness != LivenessState.DEAD]
+
     def __repr__(self):
         return pformat(vars(self), indent=4)
 
     def print(self):
-        return f"[{self.name}] -> {self.ref} ? {','.join(self.subs)}"
+        urls = ",".join(ep.url for ep in self.endpoints)
+        return f"[{self.name}] -> {urls} ? {','.join(self.subs)}"
 
     def update_event(self, evt: Event) -> bool:
         if evt.name not in self.subs:
@@ -173,6 +420,28 @@ class Function(ABC):
                 f"removing {lst} from the ready queue for function {self.name}")
             self.last_pos = None
 
+    def park(self, inv: Invocation, limit: int = 100):
+        """
+        Holds an invocation while the function is dead, dropping the oldest
+        one once `limit` invocations are held
+        """
+        self.parked.append(inv)
+        if len(self.parked) > limit:
+            dropped = self.parked.pop(0)
+            logger.warning(
+                f"Dropping parked invocation {dropped.id} of suspended function {self.name}")
+
+    def resume(self) -> List[Invocation]:
+        """
+        Returns and clears the invocations held while the function was dead
+        """
+        parked, self.parked = self.parked, []
+        endpoints = self.dispatchable()
+        for inv in parked:
+            inv.endpoints = endpoints
+            inv.url = endpoints[0]
+        return parked
+
     def generate_invocation(self) -> Invocation:
         kwargs = dict()
         for k, v in self.events.items():
@@ -182,7 +451,11 @@ class Function(ABC):
             vals["timestamp"] = v[self.last_pos].timestamp
             kwargs[k] = vals
 
-        inv = Invocation(self.ref, self.method, self.mock, json=kwargs)
+        endpoints = self.dispatchable() or [self.ref]
+        inv = Invocation(endpoints[0], self.method, self.mock, name=self.name,
+                         connect_timeout=self.connect_timeout, read_timeout=self.read_timeout,
+                         pool_size=self.pool_size, retry=self.retry, timeout=self.timeout,
+                         endpoints=endpoints, balance=self.balance, json=kwargs)
         self.reset_fn()
         self.last_invoke = int(datetime.now(
             pytz.timezone("Europe/Berlin")).timestamp()*1000)
@@ -0,0 +1,65 @@
+from abc import ABC
+from typing import List, Optional
+
+import random
+
+
+class RetryPolicy(ABC):
+    """
+    Describes how failed invocations of a function are retried by the
+    dispatcher.
+
+    The delay before the n-th retry grows exponentially from `backoff` and
+    is capped at `max_backoff`. A `jitter` fraction of that delay is
+    randomised so that invocations failing together do not retry together.
+
+    :param max_attempts: Total number of attempts, including the first one
+    :param backoff: Delay in seconds before the first retry
+    :param max_backoff: Upper bound of the delay in seconds
+    :param jitter: Fraction (0-1) of the delay that is randomised
+    :param retry_on: Status codes or classes to retry, e.g., `5xx` or `429`.
+        Connection errors and timeouts are always retried
+    """
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 1.0, max_backoff: float = 60.0,
+                 jitter: float = 0.5, retry_on: Optional[List[str]] = None):
+        super(RetryPolicy, self).__init__()
+        self.max_attempts: int = max(1, max_attempts)
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.jitter: float = min(max(jitter, 0.0), 1.0)
+        self.retry_on: List[str] = retry_on if retry_on is not None else [
+            "5xx", "429"]
+
+    def retryable(self, status: Optional[int]) -> bool:
+        if status is None:
+            return True
+        for cls in self.retry_on:
+            cls = str(cls).lower()
+            if cls.endswith("xx") and str(status)[0] == cls[0]:
+                return True
+            if cls == str(status):
+                return True
+        return False
+
+    def should_retry(self, attempts: int, status: Optional[int]) -> bool:
+        """
+        Indicates if an invocation must be retried
+
+        :param attempts: Number of attempts carried so far
+        :param status: HTTP status of the last attempt, `None` upon connection errors
+        """
+        return attempts < self.max_attempts and self.retryable(status)
+
+    def delay(self, attempts: int) -> float:
+        """
+        Returns the seconds to wait before the next attempt
+
+        :param attempts: Number of attempts carried so far
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** max(attempts - 1, 0)))
+        return delay * (1 - self.jitter * random.random())
+
+    def to_dict(self):
+        return dict(max_attempts=self.max_attempts, backoff=self.backoff,
+                    max_backoff=self.max_backoff, jitter=self.jitter, retry_on=self.retry_on)
@@ -5,3 +5,15 @@ class EventStatus(Enum):
     UNDEFINED = 1
     CREATED = 2
     READY = 3
+
+
+class BreakerState(Enum):
+    CLOSED = 1
+    OPEN = 2
+    HALF_OPEN = 3
+
+
+class LivenessState(Enum):
+    UNKNOWN = 1
+    ALIVE = 2
+    DEAD = 3
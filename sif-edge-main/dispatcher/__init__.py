@@ -1,3 +1,10 @@
 from .dispatcher import Dispatcher
+from .pool import ConnectionPools
+from .dlq import DeadLetterQueue
+from .timer import TimerWheel
+from .breaker import CircuitBreaker, CircuitBreakers
+from .balancer import LoadBalancer
+from .channel import ChannelRegistry
 
-__all__ = ["Dispatcher"]
+__all__ = ["Dispatcher", "ConnectionPools", "DeadLetterQueue", "TimerWheel",
+           "CircuitBreaker", "CircuitBreakers", "LoadBalancer", "ChannelRegistry"]
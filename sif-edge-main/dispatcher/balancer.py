@@ -0,0 +1,64 @@
+from abc import ABC
+from threading import Lock
+from typing import Dict, List
+
+import logging
+
+logger = logging.getLogger("fastapi_cli")
+
+LEAST_OUTSTANDING = "least_outstanding"
+ROUND_ROBIN = "round_robin"
+
+
+class LoadBalancer(ABC):
+    """
+    Spreads the invocations of a function across its endpoints.
+
+    Two strategies are supported: `least_outstanding` prefers the endpoint
+    with the fewest invocations in flight, while `round_robin` rotates over
+    the endpoints of each function. Both return every endpoint, ordered by
+    preference, so the dispatcher can fall back to the next one whenever a
+    circuit breaker rejects the preferred endpoint.
+    """
+
+    def __init__(self):
+        super(LoadBalancer, self).__init__()
+        self.in_flight: Dict[str, int] = {}
+        self.cursors: Dict[str, int] = {}
+        self.lock = Lock()
+
+    def order(self, name: str, endpoints: List[str], strategy: str = LEAST_OUTSTANDING) -> List[str]:
+        """
+        Returns the endpoints ordered by preference
+
+        :param name: Name of the invoked function
+        :param endpoints: Candidate endpoint URLs
+        :param strategy: Either `least_outstanding` or `round_robin`
+        """
+        with self.lock:
+            cursor = self.cursors.get(name, 0)
+            self.cursors[name] = cursor + 1
+            rotated = [endpoints[(cursor + idx) % len(endpoints)]
+                       for idx in range(len(endpoints))]
+            if strategy == ROUND_ROBIN:
+                return rotated
+            if strategy != LEAST_OUTSTANDING:
+                logger.warning(
+                    f"Unknown balancing strategy {strategy}, using {LEAST_OUTSTANDING}")
+            # Rotating first breaks ties between idle endpoints
+            return sorted(rotated, key=lambda url: self.in_flight.get(url, 0))
+
+    def acquire(self, url: str):
+        with self.lock:
+            self.in_flight[url] = self.in_flight.get(url, 0) + 1
+
+    def release(self, url: str):
+        with self.lock:
+            self.in_flight[url] = max(self.in_flight.get(url, 0) - 1, 0)
+
+    def outstanding(self, url: str) -> int:
+        return self.in_flight.get(url, 0)
+
+    def status(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.in_flight)
@@ -0,0 +1,137 @@
+from abc import ABC
+from collections import deque
+from threading import Lock
+from typing import Dict, Any, Optional
+
+import os
+import time
+import logging
+
+from common.status import BreakerState
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class CircuitBreaker(ABC):
+    """
+    Circuit breaker guarding a single function endpoint.
+
+    While CLOSED, the outcome of the last `window` invocations is tracked and
+    the breaker OPENs once at least `min_calls` were made and the share of
+    failures reaches `failure_rate`. An OPEN breaker rejects invocations
+    right away. After `open_time` seconds it becomes HALF_OPEN and lets
+    `probes` invocations through: if all succeed the breaker CLOSEs again,
+    otherwise it re-OPENs.
+
+    Only connection errors, timeouts and 5xx responses count as failures.
+    """
+
+    def __init__(self, failure_rate: float = 0.5, window: int = 10, min_calls: int = 5,
+                 open_time: float = 30.0, probes: int = 1):
+        super(CircuitBreaker, self).__init__()
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_time = open_time
+        self.probes = probes
+        self.results: deque[bool] = deque(maxlen=window)
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.probing = 0
+        self.probed = 0
+        self.lock = Lock()
+
+    def allow(self) -> bool:
+        """
+        Indicates if an invocation may be carried to the endpoint
+        """
+        with self.lock:
+            if self.state == BreakerState.OPEN:
+                if time.monotonic() < self.opened_at + self.open_time:
+                    return False
+                self.state = BreakerState.HALF_OPEN
+                self.probing, self.probed = 0, 0
+
+            if self.state == BreakerState.HALF_OPEN:
+                if self.probing >= self.probes:
+                    return False
+                self.probing += 1
+            return True
+
+    def record(self, status: Optional[int]):
+        """
+        Records the outcome of an invocation allowed by the breaker
+
+        :param status: HTTP status of the response, `None` upon connection errors
+        """
+        ok = status is not None and status < 500
+        with self.lock:
+            if self.state == BreakerState.HALF_OPEN:
+                if not ok:
+                    self._open()
+                    return
+                self.probed += 1
+                if self.probed >= self.probes:
+                    self.state = BreakerState.CLOSED
+                    self.results.clear()
+                return
+
+            self.results.append(ok)
+            if len(self.results) >= self.min_calls and self.failures() >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = BreakerState.OPEN
+        self.opened_at = time.monotonic()
+        self.results.clear()
+
+    def failures(self) -> float:
+        if len(self.results) == 0:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds until an OPEN breaker lets probes through
+        """
+        if self.state != BreakerState.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_time - time.monotonic())
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"state": self.state.name, "failure_rate": round(self.failures(), 2),
+                    "calls": len(self.results), "retry_in": round(self.remaining(), 2)}
+
+
+class CircuitBreakers(ABC):
+    """
+    Registry of circuit breakers, one per function endpoint. The defaults of
+    new breakers can be set through the `BREAKER_*` environment variables.
+    """
+
+    def __init__(self):
+        super(CircuitBreakers, self).__init__()
+        self.config = dict(
+            failure_rate=float(os.environ.get("BREAKER_FAILURE_RATE", "0.5")),
+            window=int(os.environ.get("BREAKER_WINDOW", "10")),
+            min_calls=int(os.environ.get("BREAKER_MIN_CALLS", "5")),
+            open_time=float(os.environ.get("BREAKER_OPEN_TIME", "30")),
+            probes=int(os.environ.get("BREAKER_PROBES", "1")))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        with self.lock:
+            if url not in self.breakers:
+                self.breakers[url] = CircuitBreaker(**self.config)
+            return self.breakers[url]
+
+    def status(self, url: str = None) -> Dict[str, Any]:
+        """
+        Returns the state of the breaker guarding `url`, or of all breakers
+        """
+        if url is not None:
+            return self.get(url).status()
+        with self.lock:
+            breakers = list(self.breakers.items())
+        return {url: breaker.status() for url, breaker in breakers}
@@ -0,0 +1,239 @@
+from abc import ABC
+from threading import Condition, Lock
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import os
+import json
+import asyncio
+import logging
+
+from fastapi import WebSocket, WebSocketDisconnect
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util import parse_url
+
+from common.frames import FrameType, CREDITS, encode_json, encode_credits, encode_status, decode, decode_status
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class ChannelResponse(ABC):
+    """
+    Outcome of an invocation sent over a channel, with the attributes the
+    dispatcher reads from an HTTP response
+    """
+
+    def __init__(self, status: int, reason: str):
+        super(ChannelResponse, self).__init__()
+        self.status = status
+        self.reason = reason
+
+
+class Channel(ABC):
+    """
+    Persistent connection opened by a service replica, over which SIF-edge
+    sends the invocations of the replica's functions.
+
+    The replica grants credits for invocations, i.e., how many may be
+    outstanding, and returns them once it handled them. Dispatching threads
+    wait for a credit before sending an invocation.
+
+    :param ws: WebSocket of the replica
+    :param loop: Event loop serving the WebSocket
+    :param endpoints: Hosts, as `host:port`, whose invocations the channel carries
+    :param credits: Invocations the replica accepts at first
+    """
+
+    def __init__(self, ws: WebSocket, loop: asyncio.AbstractEventLoop, endpoints: List[str], credits: int):
+        super(Channel, self).__init__()
+        self.ws = ws
+        self.loop = loop
+        self.endpoints = endpoints
+        self.credits = credits
+        self.cond = Condition()
+        self.pending: Dict[int, Future] = {}
+        self.next_id = 0
+        self.closed = False
+        self.sent = 0
+
+    def send(self, frame: bytes):
+        asyncio.run_coroutine_threadsafe(self.ws.send_bytes(frame), self.loop).result()
+
+    def acquire(self, timeout: float) -> Optional[int]:
+        """
+        Takes a credit, waiting at most `timeout` seconds for one
+
+        :returns: the ID of the invocation, `None` if no credit was granted in time
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.credits > 0, timeout):
+                return None
+            if self.closed:
+                return None
+            self.credits -= 1
+            self.next_id += 1
+            frame_id = self.next_id
+            self.pending[frame_id] = Future()
+            return frame_id
+
+    def request(self, frame_id: int, method: str, url: str, headers: Dict[str, str] = None,
+                timeout: float = None, body: Any = None) -> ChannelResponse:
+        """
+        Sends an invocation holding a credit from :meth:`acquire` and waits
+        for its result
+
+        :raises ReadTimeoutError: if the result did not arrive within `timeout` seconds
+        :raises ConnectionError: if the channel closed meanwhile
+        """
+        fut = self.pending[frame_id]
+        try:
+            self.send(encode_json(FrameType.INVOKE, frame_id, dict(
+                method=method, path=parse_url(url).request_uri, headers=headers or {}, body=body)))
+            self.sent += 1
+            return fut.result(timeout)
+        except FutureTimeout:
+            raise ReadTimeoutError(None, url, f"No result over the channel within {timeout}s")
+        finally:
+            with self.cond:
+                self.pending.pop(frame_id, None)
+
+    def on_frame(self, kind: FrameType, frame_id: int, payload: bytes):
+        if kind == FrameType.RESULT:
+            with self.cond:
+                fut = self.pending.get(frame_id)
+            if fut is not None and not fut.done():
+                fut.set_result(ChannelResponse(*decode_status(payload)))
+        elif kind == FrameType.CREDIT:
+            credits, = CREDITS.unpack_from(payload)
+            with self.cond:
+                self.credits += credits
+                self.cond.notify_all()
+        else:
+            logger.warning(f"Ignoring unexpected {kind.name} frame on the channel of {self.endpoints}")
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+            self.cond.notify_all()
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("The channel closed before the result arrived"))
+
+    def status(self) -> Dict[str, Any]:
+        with self.cond:
+            return dict(credits=self.credits, outstanding=len(self.pending), sent=self.sent)
+
+
+class ChannelRegistry(ABC):
+    """
+    Persistent channels opened by service replicas at `/api/channel`.
+
+    Replicas push their events and receive the invocations of their
+    functions over a single WebSocket, in compact binary frames (see
+    :mod:`common.frames`), instead of one HTTP request each. Both ways are
+    flow controlled with credits: SIF-edge grants `window` events in flight
+    and the replica grants the invocations it is willing to run at once.
+    Invocations of hosts without a channel, or for which no credit frees up
+    within `credit_wait` seconds, are sent over HTTP as before.
+
+    :param window: Events a replica may send before SIF-edge grants more, defaults to `CHANNEL_WINDOW` or 64
+    :param credit_wait: Seconds to wait for an invocation credit, defaults to `CHANNEL_CREDIT_WAIT` or 5
+    """
+
+    def __init__(self, window: int = None, credit_wait: float = None):
+        super(ChannelRegistry, self).__init__()
+        self.window: int = window or int(os.environ.get("CHANNEL_WINDOW", "64"))
+        self.credit_wait: float = credit_wait if credit_wait is not None else float(
+            os.environ.get("CHANNEL_CREDIT_WAIT", "5"))
+        self.channels: Dict[Tuple[str, int], Channel] = {}
+        self.lock = Lock()
+        self.events = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def key(url: str) -> Tuple[str, int]:
+        parsed = parse_url(url if "://" in url else f"http://{url}")
+        return parsed.host, parsed.port or 80
+
+    def get(self, url: str) -> Optional[Channel]:
+        with self.lock:
+            return self.channels.get(self.key(url))
+
+    def request(self, method: str, url: str, headers: Dict[str, str] = None, timeout: float = None,
+                **kwargs) -> Optional[ChannelResponse]:
+        """
+        Sends an invocation over the channel of its host
+
+        :returns: the response, `None` if it must be sent over HTTP instead
+        """
+        channel = self.get(url)
+        if channel is None:
+            return None
+        frame_id = channel.acquire(self.credit_wait)
+        if frame_id is None:
+            with self.lock:
+                self.fallbacks += 1
+            logger.warning(f"No invocation credit on the channel of {url}, falling back to HTTP")
+            return None
+        return channel.request(frame_id, method, url, headers=headers, timeout=timeout, body=kwargs.get("json"))
+
+    async def serve(self, ws: WebSocket, on_event: Callable[[Dict[str, Any]], None]):
+        """
+        Serves the channel of a replica until it disconnects
+
+        :param ws: WebSocket opened by the replica
+        :param on_event: Called with every EventRequest the replica sends
+        """
+        await ws.accept()
+        kind, _, payload = decode(await ws.receive_bytes())
+        if kind != FrameType.HELLO:
+            await ws.close(code=1002)
+            return
+        hello = json.loads(payload)
+        channel = Channel(ws, asyncio.get_running_loop(), hello.get("endpoints", []), int(hello.get("credits", 1)))
+        keys = [self.key(ep) for ep in channel.endpoints]
+        with self.lock:
+            for key in keys:
+                self.channels[key] = channel
+        logger.info(f"Opened channel of {channel.endpoints}")
+
+        await ws.send_bytes(encode_credits(self.window))
+        owed = 0
+        try:
+            while True:
+                kind, frame_id, payload = decode(await ws.receive_bytes())
+                if kind != FrameType.EVENT:
+                    channel.on_frame(kind, frame_id, payload)
+                    continue
+                try:
+                    on_event(json.loads(payload))
+                    ack = encode_status(FrameType.ACK, frame_id, 200)
+                except Exception as err:
+                    ack = encode_status(FrameType.ACK, frame_id, 400, str(err))
+                await ws.send_bytes(ack)
+                with self.lock:
+                    self.events += 1
+                owed += 1
+                if owed >= max(self.window // 2, 1):
+                    await ws.send_bytes(encode_credits(owed))
+                    owed = 0
+        except WebSocketDisconnect:
+            pass
+        except ValueError as err:
+            logger.error(f"Closing channel of {channel.endpoints} after a malformed frame: {err}")
+            await ws.close(code=1002)
+        finally:
+            with self.lock:
+                for key in keys:
+                    if self.channels.get(key) is channel:
+                        del self.channels[key]
+            channel.close()
+            logger.info(f"Closed channel of {channel.endpoints}")
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            channels = {f"{host}:{port}": ch for (host, port), ch in self.channels.items()}
+            events, fallbacks = self.events, self.fallbacks
+        return {"open": {key: ch.status() for key, ch in channels.items()},
+                "events": events, "fallbacks": fallbacks}
@@ -1,18 +1,39 @@
 from abc import ABC
 from threading import Thread
 from multiprocessing import Queue
+from typing import Dict, Any, List, Optional
 
+import os
 import logging
 import common
 
+from .balancer import LoadBalancer
+from .breaker import CircuitBreakers
+from .dlq import DeadLetterQueue
+from .pool import ConnectionPools
+from .channel import ChannelRegistry
+from .timer import TimerWheel
+
 logger = logging.getLogger("fastapi_cli")
 
 
 class Dispatcher(ABC):
-    def __init__(self):
+    def __init__(self, pool_size: int = None, retry: common.RetryPolicy = None,
+                 base_path: str = "/data", dlq_name: str = "dlq.pkl", workers: int = None):
         super(Dispatcher, self).__init__()
 
+        self.workers: int = workers or int(
+            os.environ.get("DISPATCHER_WORKERS", "4"))
         self.event_loop: Queue[common.Invocation] = Queue()
+        self.pools = ConnectionPools(maxsize=pool_size)
+        self.channels = ChannelRegistry()
+        self.retry = retry or common.RetryPolicy()
+        self.timers = TimerWheel()
+        self.dlq = DeadLetterQueue(base_path, dlq_name)
+        self.breakers = CircuitBreakers()
+        self.balancer = LoadBalancer()
+        self.retries = 0
+        self.timeouts = 0
 
     def return_event_loop(self) -> "Queue[common.Invocation]":
         """
@@ -21,12 +42,94 @@ class Dispatcher(ABC):
         """
         return self.event_loop
 
-    def wait_loop(self) -> Thread:
-        dispatcher_thread = Thread(target=self._wait_loop)
-        dispatcher_thread.start()
-        return dispatcher_thread
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns the dispatcher's runtime metrics
+        """
+        return {"pools": self.pools.stats(),
+                "channels": self.channels.status(),
+                "retries": {"scheduled": self.retries, "pending": len(self.timers)},
+                "timeouts": self.timeouts,
+                "dead_letters": len(self.dlq),
+                "breakers": self.breakers.status(),
+                "outstanding": self.balancer.status()}
+
+    def dispatch(self, inv: common.Invocation):
+        """
+        Invokes the remote function on the endpoint picked by the load
+        balancer and, upon failure, either schedules a retry following the
+        function's retry policy or dead-letters the invocation. Endpoints
+        whose circuit breaker is open are skipped, and if all of them are,
+        the invocation fails right away without reaching the network. Invocations exceeding
+        their timeout are not retried, so a stuck handler is not started again
+        """
+        breaker = None
+        for url in self.balancer.order(inv.name, inv.endpoints, inv.balance):
+            if self.breakers.get(url).allow():
+                inv.url, breaker = url, self.breakers.get(url)
+                break
+
+        if breaker is not None:
+            self.balancer.acquire(inv.url)
+            try:
+                ok = inv.invoke(self.pools, self.channels)
+            finally:
+                self.balancer.release(inv.url)
+            # Mock invocations never reach the endpoint, so they say nothing about its health
+            if not inv.mock:
+                breaker.record(inv.last_status)
+            if ok:
+                return
+        else:
+            inv.attempts += 1
+            inv.last_status, inv.last_error = None, "circuit breaker is open"
+            logger.warning(
+                f"Circuit breakers for all endpoints of {inv.name} are open, failing invocation fast")
+
+        if inv.timed_out:
+            self.timeouts += 1
+            self.dlq.put(inv)
+            return
+
+        policy = inv.retry or self.retry
+        if policy.should_retry(inv.attempts, inv.last_status):
+            delay = policy.delay(inv.attempts)
+            if breaker is None:
+                delay = max(delay, min(self.breakers.get(url).remaining() for url in inv.endpoints))
+            logger.info(
+                f"Retrying invocation of {inv.name} in {delay:.2f}s (attempt {inv.attempts + 1}/{policy.max_attempts})")
+            self.retries += 1
+            self.timers.schedule(delay, lambda: self.event_loop.put(inv, True))
+        else:
+            self.dlq.put(inv)
+
+    def redrive(self, ids: Optional[List[str]] = None) -> int:
+        """
+        Moves dead-lettered invocations back into the dispatcher's queue
+
+        :param ids: Invocations to re-drive, all of them if not given
+        :returns: number of re-driven invocations
+        """
+        invs = self.dlq.pop(ids)
+        for inv in invs:
+            inv.attempts = 0
+            self.event_loop.put(inv, True)
+        return len(invs)
+
+    def wait_loop(self) -> List[Thread]:
+        """
+        Starts `workers` dispatching threads, so a slow function only holds
+        one of them until its timeout expires
+        """
+        self.timers.wait_loop()
+        dispatcher_threads = []
+        for _ in range(self.workers):
+            dispatcher_thread = Thread(target=self._wait_loop)
+            dispatcher_thread.start()
+            dispatcher_threads.append(dispatcher_thread)
+        return dispatcher_threads
 
     def _wait_loop(self):
         while (event := self.event_loop.get(True)):
             logger.info("event incoming for processing")
-            event.invoke()
+            self.dispatch(event)
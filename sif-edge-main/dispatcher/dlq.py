@@ -0,0 +1,66 @@
+from abc import ABC
+from threading import Lock
+from typing import Dict, List, Optional
+
+import os
+import pickle
+import logging
+import common
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class DeadLetterQueue(ABC):
+    """
+    Persistent store of invocations that exhausted their retries.
+
+    Entries are checkpointed to `base_path/chk_name` on every change, so
+    failed invocations survive restarts of sif-edge until they are either
+    re-driven or discarded.
+    """
+
+    def __init__(self, base_path: str = "/data", chk_name: str = "dlq.pkl"):
+        super(DeadLetterQueue, self).__init__()
+        self.path = os.path.join(base_path, chk_name)
+        self.entries: Dict[str, common.Invocation] = {}
+        self.lock = Lock()
+        self.restore_chk()
+
+    def restore_chk(self):
+        if os.path.isfile(self.path):
+            with open(self.path, "rb") as chk:
+                self.entries = pickle.load(chk)
+            logger.info(
+                f"{len(self.entries)} dead-lettered invocations have been restored")
+
+    def handle_chk(self):
+        try:
+            with open(self.path, "wb") as chk:
+                pickle.dump(self.entries, chk)
+        except OSError as err:
+            logger.error(f"Failure persisting the dead-letter queue because {err}")
+
+    def put(self, inv: common.Invocation):
+        with self.lock:
+            self.entries[inv.id] = inv
+            self.handle_chk()
+        logger.error(
+            f"Invocation {inv.id} of {inv.name} has been dead-lettered after {inv.attempts} attempts")
+
+    def pop(self, ids: Optional[List[str]] = None) -> List[common.Invocation]:
+        """
+        Removes and returns the given entries, or all of them if no ids are given
+        """
+        with self.lock:
+            ids = list(self.entries.keys()) if ids is None else ids
+            invs = [self.entries.pop(idx) for idx in ids if idx in self.entries]
+            if invs:
+                self.handle_chk()
+        return invs
+
+    def status(self) -> List[dict]:
+        with self.lock:
+            return [inv.status() for inv in self.entries.values()]
+
+    def __len__(self):
+        return len(self.entries)
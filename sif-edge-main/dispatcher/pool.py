@@ -0,0 +1,110 @@
+from abc import ABC
+from threading import Lock
+from typing import Dict, Tuple, Optional, Any
+
+import os
+import urllib3
+import logging
+
+from urllib3.connectionpool import HTTPConnectionPool, connection_from_url
+from urllib3.util import parse_url
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class ConnectionPools(ABC):
+    """
+    Registry of keep-alive connection pools owned by the dispatcher.
+
+    Pools are keyed by the target's scheme, host and port, so every function
+    living behind the same service shares the same set of persistent
+    connections. Unlike the module-level `urllib3.request`, connections are
+    returned to the pool once a response has been read and reused by the next
+    invocation to the same host.
+
+    :param maxsize: Default number of connections kept alive per host
+    """
+
+    def __init__(self, maxsize: int = None):
+        super(ConnectionPools, self).__init__()
+        self.maxsize: int = maxsize or int(
+            os.environ.get("DISPATCHER_POOL_SIZE", "4"))
+        self.pools: Dict[Tuple[str, str, int], HTTPConnectionPool] = {}
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def pool_key(url: str) -> Tuple[str, str, int]:
+        parsed = parse_url(url)
+        scheme = parsed.scheme or "http"
+        port = parsed.port or (443 if scheme == "https" else 80)
+        return scheme, parsed.host, port
+
+    def connection_from_url(self, url: str, pool_size: Optional[int] = None) -> HTTPConnectionPool:
+        """
+        Returns the pool serving the host of `url`, creating it upon the first
+        request to that host
+
+        :param url: Target URL, the scheme defaults to `http` when missing
+        :param pool_size: Overrides the default pool size for a new host
+        """
+        key = self.pool_key(url)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is not None:
+                self.hits += 1
+                return pool
+
+            self.misses += 1
+            scheme, host, port = key
+            logger.info(f"Creating connection pool for {scheme}://{host}:{port}")
+            pool = connection_from_url(f"{scheme}://{host}:{port}",
+                                       maxsize=pool_size or self.maxsize, block=False)
+            self.pools[key] = pool
+            return pool
+
+    def request(self, method: str, url: str, connect_timeout: Optional[float] = None,
+                read_timeout: Optional[float] = None, total_timeout: Optional[float] = None,
+                pool_size: Optional[int] = None, **kwargs: Any) -> urllib3.BaseHTTPResponse:
+        """
+        Carries an HTTP request through the pool of the target host
+
+        :param method: HTTP method
+        :param url: Target URL
+        :param connect_timeout: Seconds to wait for establishing a new connection
+        :param read_timeout: Seconds to wait for the response
+        :param total_timeout: Seconds the whole request may take
+        :param pool_size: Connections kept alive for the host, if not yet pooled
+        """
+        if "://" not in url:
+            url = f"http://{url}"
+        pool = self.connection_from_url(url, pool_size)
+        timeout = urllib3.Timeout(
+            connect=connect_timeout if connect_timeout is not None else urllib3.Timeout.DEFAULT_TIMEOUT,
+            read=read_timeout if read_timeout is not None else urllib3.Timeout.DEFAULT_TIMEOUT,
+            total=total_timeout)
+        return pool.request(method, parse_url(url).request_uri, timeout=timeout, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the pool hit/miss counters and the connection reuse per host
+        """
+        hosts = []
+        with self.lock:
+            for (scheme, host, port), pool in self.pools.items():
+                hosts.append({
+                    "host": f"{scheme}://{host}:{port}",
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                    "reused": max(pool.num_requests - pool.num_connections, 0),
+                })
+            return {"hits": self.hits, "misses": self.misses, "hosts": hosts}
+
+    def clear(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
+            self.pools.clear()
@@ -0,0 +1,83 @@
+from abc import ABC
+from math import ceil
+from threading import Thread, Condition
+from typing import Callable, List
+
+import time
+import logging
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class TimerWheel(ABC):
+    """
+    Hashed timer wheel used to schedule delayed callbacks, e.g., retries,
+    without blocking the dispatcher.
+
+    Timers are hashed into `slots` buckets of `tick` seconds each. Timers
+    further away than one revolution keep a count of the remaining rounds.
+    The wheel thread only ticks while timers are pending.
+
+    :param tick: Resolution of the wheel in seconds
+    :param slots: Number of buckets of the wheel
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 512):
+        super(TimerWheel, self).__init__()
+        self.tick = tick
+        self.slots: List[List[list]] = [[] for _ in range(slots)]
+        self.cursor = 0
+        self.pending = 0
+        self.cond = Condition()
+
+    def schedule(self, delay: float, cb: Callable[[], None]):
+        """
+        Runs `cb` in the wheel thread once `delay` seconds have elapsed
+
+        :param delay: Seconds to wait
+        :param cb: Callback without arguments
+        """
+        ticks = max(1, ceil(delay / self.tick))
+        with self.cond:
+            slot = (self.cursor + ticks) % len(self.slots)
+            rounds = (ticks - 1) // len(self.slots)
+            self.slots[slot].append([rounds, cb])
+            self.pending += 1
+            self.cond.notify()
+
+    def __len__(self):
+        return self.pending
+
+    def wait_loop(self) -> Thread:
+        wheel_thr = Thread(target=self._wait_loop, daemon=True)
+        wheel_thr.start()
+        return wheel_thr
+
+    def _wait_loop(self):
+        next_tick = time.monotonic()
+        while True:
+            with self.cond:
+                while self.pending == 0:
+                    self.cond.wait()
+                    next_tick = time.monotonic()
+
+            next_tick += self.tick
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+            with self.cond:
+                self.cursor = (self.cursor + 1) % len(self.slots)
+                due, waiting = [], []
+                for timer in self.slots[self.cursor]:
+                    if timer[0] == 0:
+                        due.append(timer[1])
+                    else:
+                        timer[0] -= 1
+                        waiting.append(timer)
+                self.slots[self.cursor] = waiting
+                self.pending -= len(due)
+
+            for cb in due:
+                try:
+                    cb()
+                except Exception as err:
+                    logger.error(f"Failure running timer callback because {err}")
@@ -1,9 +1,12 @@
-from common import EventRequest, Event, BaseFunction, Function, DeleteFunction
-from fastapi import FastAPI
+from common import EventRequest, EventBatch, Event, BaseFunction, FunctionBatch, Function, DeleteFunction, \
+    DeadLetterRequest, LeaseRequest, RetryPolicy
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import JSONResponse
 from dispatcher import Dispatcher
-from scheduler import Scheduler
+from scheduler import Scheduler, HealthMonitor, LeaseTable
 import builtins
 import traceback
+from typing import Any, Dict
 
 app = FastAPI()
 
@@ -13,31 +16,108 @@ sch = Scheduler(
 
 dispatcher.wait_loop()
 sch.wait_loop()
+HealthMonitor(sch).wait_loop()
 
 sch_evt_loop = sch.return_event_loop()
+leases = LeaseTable()
 
 
 @app.post("/api/event")
 def handle_event(evt_req: EventRequest):
-    evt = Event(evt_req.name, data=evt_req.data)
+    evt = Event(evt_req.name, data=evt_req.data, handled=evt_req.handled)
     sch_evt_loop.put(evt, True)
     return
 
 
+@app.post("/api/events")
+def handle_events(batch: EventBatch):
+    for evt_req in batch.events:
+        sch_evt_loop.put(Event(evt_req.name, data=evt_req.data, handled=evt_req.handled), True)
+    return
+
+
+def accept_event(evt: Dict[str, Any]):
+    evt_req = EventRequest(**evt)
+    sch_evt_loop.put(Event(evt_req.name, data=evt_req.data, handled=evt_req.handled), True)
+
+
+@app.websocket("/api/channel")
+async def channel(ws: WebSocket):
+    await dispatcher.channels.serve(ws, accept_event)
+
+
+def to_function(fn_data: BaseFunction) -> Function:
+    return Function(fn_data.name, fn_data.subs, fn_data.url,
+                    fn_data.mock, fn_data.method,
+                    connect_timeout=fn_data.connect_timeout,
+                    read_timeout=fn_data.read_timeout,
+                    pool_size=fn_data.pool_size,
+                    retry=RetryPolicy(**fn_data.retry.model_dump()) if fn_data.retry else None,
+                    timeout=fn_data.timeout,
+                    balance=fn_data.balance)
+
+
 @app.post("/api/function")
 def register_fn(fn_data: BaseFunction):
-    fn = Function(fn_data.name, fn_data.subs, fn_data.url,
-                  fn_data.mock, fn_data.method)
-    sch.register_fn(fn)
+    sch.register_fn(to_function(fn_data))
+    return
+
+
+@app.post("/api/functions")
+def register_fns(batch: FunctionBatch):
+    sch.register_fns([to_function(fn_data) for fn_data in batch.functions])
     return
 
 
 @app.delete("/api/function")
 def delete_fn(fn_data: DeleteFunction):
-    sch.delete_fn(fn_data.name)
+    sch.delete_fn(fn_data.name, fn_data.url)
     return
 
 
 @app.get("/api/status")
 def status_fn():
-    return sch.status_sch()
+    status = sch.status_sch()
+    for fn_status in status:
+        for ep_status in fn_status["endpoints"]:
+            ep_status["breaker"] = dispatcher.breakers.status(ep_status["url"])
+            ep_status["outstanding"] = dispatcher.balancer.outstanding(ep_status["url"])
+    return status
+
+
+@app.get("/api/metrics")
+def metrics_fn():
+    return dispatcher.metrics()
+
+
+@app.get("/api/dlq")
+def dlq_fn():
+    return dispatcher.dlq.status()
+
+
+@app.post("/api/dlq/redrive")
+def redrive_fn(req: DeadLetterRequest):
+    return {"redriven": dispatcher.redrive(req.ids)}
+
+
+@app.delete("/api/dlq")
+def discard_dlq_fn(req: DeadLetterRequest):
+    return {"discarded": len(dispatcher.dlq.pop(req.ids))}
+
+
+@app.post("/api/lease")
+def acquire_lease(req: LeaseRequest):
+    if not leases.acquire(req.key, req.holder, req.ttl):
+        return JSONResponse(status_code=409, content={"detail": f"Lease {req.key} is held by another replica"})
+    return
+
+
+@app.delete("/api/lease")
+def release_lease(req: LeaseRequest):
+    return {"released": leases.release(req.key, req.holder)}
+
+
+@app.get("/api/leases")
+def leases_fn():
+    return leases.status()
+
@@ -1,3 +1,5 @@
 from .sch import Scheduler
+from .health import HealthMonitor
+from .lease import LeaseTable
 
-__all__ = ["Scheduler"]
+__all__ = ["Scheduler", "HealthMonitor", "LeaseTable"]
@@ -0,0 +1,69 @@
+from abc import ABC
+from threading import Thread
+from typing import Dict, List, TYPE_CHECKING
+
+import os
+import time
+import urllib3
+import logging
+
+if TYPE_CHECKING:
+    from .sch import Scheduler
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class HealthMonitor(ABC):
+    """
+    Periodically probes the `/health` route of every service hosting a
+    registered function and reports the outcome to the scheduler, which
+    suspends the dispatch to dead functions and resumes it once they answer
+    again.
+
+    Any HTTP response below 500 counts as alive, so services deployed
+    before the `/health` route was added to `LocalGateway` are not
+    suspended.
+
+    :param scheduler: Scheduler owning the registered functions
+    :param interval: Seconds between two probing rounds
+    :param threshold: Consecutive failed probes after which a function is considered dead
+    :param timeout: Seconds to wait for each probe
+    """
+
+    def __init__(self, scheduler: "Scheduler", interval: float = None,
+                 threshold: int = None, timeout: float = None):
+        super(HealthMonitor, self).__init__()
+        self.scheduler = scheduler
+        self.interval = interval or float(
+            os.environ.get("HEALTH_INTERVAL", "15"))
+        self.threshold = threshold or int(
+            os.environ.get("HEALTH_FAILURE_THRESHOLD", "3"))
+        timeout = timeout or float(os.environ.get("HEALTH_TIMEOUT", "2"))
+        self.http = urllib3.PoolManager(
+            retries=False, timeout=urllib3.Timeout(connect=timeout, read=timeout))
+
+    def probe(self, url: str) -> bool:
+        try:
+            res = self.http.request("GET", url)
+            return res.status < 500
+        except Exception as err:
+            logger.debug(f"Health probe of {url} failed because {err}")
+            return False
+
+    def probe_all(self):
+        targets: Dict[str, List[str]] = self.scheduler.health_targets()
+        results = {url: self.probe(url) for url in targets}
+        self.scheduler.update_liveness(results, self.threshold)
+
+    def wait_loop(self) -> Thread:
+        health_thr = Thread(target=self._wait_loop, daemon=True)
+        health_thr.start()
+        return health_thr
+
+    def _wait_loop(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as err:
+                logger.error(f"Failure probing function endpoints because {err}")
+            time.sleep(self.interval)
@@ -0,0 +1,58 @@
+from abc import ABC
+from threading import Lock
+from typing import Any, Dict, Tuple
+
+import time
+import logging
+
+logger = logging.getLogger("fastapi_cli")
+
+
+class LeaseTable(ABC):
+    """
+    Leases taken by the replicas of a service to elect the one running its
+    periodic triggers, see `LeaderElector` in the base library.
+
+    A lease belongs to its holder until it expires, unless the holder renews
+    it beforehand. Leases live in memory only: once SIF-edge restarts, the
+    next renewal of the former leader takes its lease back.
+    """
+
+    def __init__(self):
+        super(LeaseTable, self).__init__()
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        self.lock = Lock()
+
+    def acquire(self, key: str, holder: str, ttl: float) -> bool:
+        """
+        Takes or renews the lease `key` for `ttl` seconds
+
+        :returns: whether `holder` holds the lease
+        """
+        now = time.monotonic()
+        with self.lock:
+            current = self.leases.get(key)
+            if current is not None and current[0] != holder and current[1] > now:
+                return False
+            if current is None or current[0] != holder:
+                logger.info(f"Lease {key} taken by {holder}")
+            self.leases[key] = (holder, now + ttl)
+            return True
+
+    def release(self, key: str, holder: str) -> bool:
+        """
+        :returns: whether `holder` held the lease
+        """
+        with self.lock:
+            current = self.leases.get(key)
+            if current is None or current[0] != holder:
+                return False
+            del self.leases[key]
+            logger.info(f"Lease {key} released by {holder}")
+            return True
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self.lock:
+            return {key: dict(holder=holder, expires_in=round(expires - now, 3))
+                    for key, (holder, expires) in self.leases.items() if expires > now}
@@ -1,11 +1,12 @@
 from abc import ABC
-from typing import List
+from typing import List, Dict
 from threading import Thread, Lock
 from multiprocessing import Queue
 
 import os
 import pickle
 import common
+from common.status import LivenessState
 import traceback
 import logging
 
@@ -28,24 +29,63 @@ class Scheduler(ABC):
     def return_event_loop(self) -> Queue:
         return self.event_loop
 
-    def __reg_fn(self, fn: common.Function):
+    def __reg_fn(self, fn: common.Function, persist: bool = True):
         logger.info(f"Registering function with name {fn.name}")
         self.function_loop.append(fn)
         self.fn_names.append(fn.name)
-        path = os.path.join(self.base_path, self.chk_name)
-        self.handle_chk(path)
+        if persist:
+            path = os.path.join(self.base_path, self.chk_name)
+            self.handle_chk(path)
 
     def register_fn(self, fn: common.Function):
+        """
+        Registers a function. If a function with the same name and
+        subscriptions exists, the new URL is added to its endpoints, so each
+        replica of a service registers itself independently. Otherwise, the
+        existing function is recreated
+        """
+        self.register_fns([fn])
+
+    def register_fns(self, fns: List[common.Function]):
+        """
+        Registers several functions as :meth:`register_fn` does, while
+        writing the checkpoint only once for all of them
+        """
         self.lock.acquire(blocking=True)
-        if fn.name not in self.fn_names:
-            self.__reg_fn(fn)
+        try:
+            for fn in fns:
+                self.__register(fn)
+            self.handle_chk(os.path.join(self.base_path, self.chk_name))
+        finally:
+            self.lock.release()
+
+    def __register(self, fn: common.Function):
+        existing = self.__get_fn(fn.name)
+        if existing is None:
+            self.__reg_fn(fn, persist=False)
+        elif existing.subs == fn.subs and existing.method == fn.method:
+            was_dead = existing.liveness == LivenessState.DEAD
+            existing.add_endpoint(fn.ref)
+            for attr in ("connect_timeout", "read_timeout", "pool_size", "retry", "timeout", "balance"):
+                setattr(existing, attr, getattr(fn, attr))
+            if was_dead:
+                for inv in existing.resume():
+                    self.dispatcher.put(inv, True)
         else:
             logger.warn(
                 f"Function with name {fn.name} already exists... Recreating...")
-            self.__del_fn(fn.name)
-            self.__reg_fn(fn)
+            fn.parked = existing.parked
+            self.__del_fn(fn.name, persist=False)
+            self.__reg_fn(fn, persist=False)
             logger.info(f"Function with name {fn.name} has been recreated!")
-        self.lock.release()
+            for inv in fn.resume():
+                self.dispatcher.put(inv, True)
+
+    def __get_fn(self, name: str) -> common.Function:
+        for fn in self.function_loop:
+            if fn.name == name:
+                return fn
+        return None
 
     def restore_chk(self, path: str):
         if os.path.isfile(path):
@@ -56,7 +96,7 @@ class Scheduler(ABC):
                 self.fn_names.append(fn.name)
                 logger.info(fn.print())
 
-    def __del_fn(self, name: str):
+    def __del_fn(self, name: str, persist: bool = True):
         del_idx = -1
         for idx, fn in enumerate(self.function_loop):
             if fn.name == name:
@@ -65,12 +105,24 @@ class Scheduler(ABC):
         if del_idx >= 0:
             del self.function_loop[del_idx]
             self.fn_names.remove(name)
-            path = os.path.join(self.base_path, self.chk_name)
-            self.handle_chk(path)
-
-    def delete_fn(self, name: str):
+            if persist:
+                path = os.path.join(self.base_path, self.chk_name)
+                self.handle_chk(path)
+
+    def delete_fn(self, name: str, url: str = None):
+        """
+        Deletes a function or, if `url` is given, only the endpoint with that
+        URL. A function is deleted along with its last endpoint
+        """
         self.lock.acquire(True)
-        self.__del_fn(name)
+        fn = self.__get_fn(name)
+        if url is None or fn is None:
+            self.__del_fn(name)
+        elif fn.remove_endpoint(url):
+            if len(fn.endpoints) == 0:
+                self.__del_fn(name)
+            else:
+                self.handle_chk(os.path.join(self.base_path, self.chk_name))
         self.lock.release()
 
     def generate_invocation(self, fn: common.Function):
@@ -78,6 +130,11 @@ class Scheduler(ABC):
         # self.function_loop.remove(fn)
         self.handle_chk(path)
         inv = fn.generate_invocation()
+        if fn.liveness == LivenessState.DEAD:
+            logger.warning(
+                f"Function {fn.name} is not alive, suspending invocation {inv.id}")
+            fn.park(inv)
+            return
         self.dispatcher.put(inv, True)
 
     def handle_chk(self, path: str):
@@ -101,10 +158,54 @@ class Scheduler(ABC):
                         evts["ready"].append(fn.subs[idx])
                 fn_status["events"].append(evts)
             fn_status["name"] = fn.name
+            fn_status["url"] = fn.ref
+            fn_status["endpoints"] = [ep.status() for ep in fn.endpoints]
+            fn_status["liveness"] = fn.liveness.name
+            fn_status["last_seen"] = fn.last_seen
+            fn_status["suspended"] = len(fn.parked)
             status.append(fn_status)
         self.lock.release()
         return status
 
+    def health_targets(self) -> Dict[str, List[str]]:
+        """
+        Returns the health routes to probe along with the functions behind them
+        """
+        targets = {}
+        self.lock.acquire(True)
+        for fn in self.function_loop:
+            if not fn.mock:
+                for ep in fn.endpoints:
+                    targets.setdefault(ep.health_url(), []).append(fn.name)
+        self.lock.release()
+        return targets
+
+    def update_liveness(self, results: Dict[str, bool], threshold: int):
+        """
+        Applies the outcome of health probes to the registered functions,
+        suspending dead ones and re-dispatching the invocations held for
+        the ones that came back
+
+        :param results: Whether each probed health route answered
+        :param threshold: Consecutive failed probes after which a function is considered dead
+        """
+        changed = False
+        self.lock.acquire(True)
+        for fn in self.function_loop:
+            prev = fn.liveness
+            for ep in fn.endpoints:
+                alive = results.get(ep.health_url())
+                if alive is not None and ep.record_probe(alive, threshold):
+                    changed = True
+                    logger.info(
+                        f"Endpoint {ep.url} of function {fn.name} is now {ep.liveness.name}")
+            if prev == LivenessState.DEAD and fn.liveness != LivenessState.DEAD:
+                for inv in fn.resume():
+                    self.dispatcher.put(inv, True)
+        if changed:
+            self.handle_chk(os.path.join(self.base_path, self.chk_name))
+        self.lock.release()
+
     def submit_event(self):
         pass
 
@@ -118,6 +219,9 @@ class Scheduler(ABC):
             event = self.event_loop.get(True)
             self.lock.acquire(blocking=True)
             for fn in self.function_loop:
+                if fn.name in event.handled:
+                    # The emitting service already invoked it in-process
+                    continue
                 try:
                     ready_inv = fn.update_event(event)
                     if ready_inv:
@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from unittest import mock
+
+import common
+
+from common.status import BreakerState
+from dispatcher import Dispatcher
+
+
+class DispatcherBreakerTest(unittest.TestCase):
+    """
+    Circuit breakers only track invocations that reached the endpoint
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dispatcher = Dispatcher(base_path=tmp.name, workers=1)
+        self.url = "http://localhost:8000/fn"
+
+    def test_mock_invocations_keep_breaker_closed(self):
+        for _ in range(20):
+            self.dispatcher.dispatch(common.Invocation(self.url, "POST", True, name="fn"))
+
+        self.assertEqual(self.dispatcher.breakers.get(self.url).state, BreakerState.CLOSED)
+        self.assertEqual(len(self.dispatcher.dlq), 0)
+        self.assertEqual(self.dispatcher.retries, 0)
+
+    def test_connection_errors_open_breaker(self):
+        with mock.patch("urllib3.request", side_effect=ConnectionError("refused")):
+            for _ in range(5):
+                self.dispatcher.dispatch(common.Invocation(
+                    self.url, "POST", False, name="fn",
+                    retry=common.RetryPolicy(max_attempts=1)))
+
+        self.assertEqual(self.dispatcher.breakers.get(self.url).state, BreakerState.OPEN)
+        self.assertEqual(len(self.dispatcher.dlq), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()